@@ -10,10 +10,23 @@ else:
     ext = [
         Extension(
             'wsdatautil._wsframecoder',
-            sources=['src/wsdatautil/_wsframecoder.c'],
+            sources=[
+                'src/wsdatautil/_wsframecoder.c',
+                'src/wsdatautil/_wsframecoder_masking.c',
+                'src/wsdatautil/_wsframecoder_sha1.c',
+            ],
+            depends=['src/wsdatautil/_wsframecoder.h'],
             extra_compile_args=['-std=c99']
         )
     ]
+    if os.environ.get("BUILD_CYTHON") == "1":
+        # compile the Python wrappers as well, typed by the sidecar __init__.pxd
+        from Cython.Build import cythonize
+        ext += cythonize(
+            [Extension('wsdatautil.__init__', sources=['src/wsdatautil/__init__.py'])],
+            language_level=3,
+            compiler_directives={"annotation_typing": False},
+        )
 
 setup(
     long_description=(root_dir / "README.rst").read_text("utf-8"),
@@ -0,0 +1,13 @@
+cdef class ProgressiveStreamReader:
+    cdef public int opcode
+    cdef public object mask
+    cdef public int fin
+    cdef public int rsv1
+    cdef public int rsv2
+    cdef public int rsv3
+    cdef public int amount_spec
+    cdef public object amount
+    cdef public bint masked
+    cdef public int header_continuation
+    cdef public object _make_frame_
+    cdef public object _progressive_read_
@@ -1,6 +1,7 @@
 """
 The WsDataUtil is a lightweight, highly compatible Python module for processing WebSocket data.
-The parsing, building and masking of WebSocket frames is implemented in C to increase performance.
+The parsing, building and masking of WebSocket frames is implemented in C to increase performance,
+with a pure Python fallback if the C extension is not built.
 
 The core of the module is the ``Frame`` and the ``StreamReader`` object as an interface to the C api.
 ``Frame`` serves as the result value from parsing and as the parameter for building a WebSocket frame.
@@ -12,13 +13,14 @@ For the sake of completeness, the ``HandshakeRequest`` object is available.
 
 from __future__ import annotations
 
-from typing import Literal, NamedTuple, Generator, Callable
+from typing import Literal, NamedTuple, Generator, Callable, Iterable, cast
 from base64 import b64encode
-from collections import OrderedDict
-from hashlib import sha1
-from uuid import uuid4
+from os import urandom
 
-from . import _wsframecoder
+try:
+    from . import _wsframecoder
+except ImportError:  # built without the C extension (BUILD_EXTENSION=0)
+    from . import _pywsframecoder as _wsframecoder  # type: ignore[no-redef]
 
 
 __version__ = "1.1"
@@ -32,35 +34,33 @@ def _make_accept_key(b64key: bytes):
         - The result is hashed with the SHA-1 function.
         - A base64 string is then created from the digest and returned as `<String-Out>`.
     """
-    return b64encode(
-        sha1(
-            b64key + b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
-        ).digest()
-    )
+    return _wsframecoder.accept_key(b64key)
 
 
-class HeaderObj(OrderedDict[bytes, bytes]):
+class HeaderObj(dict[bytes, bytes]):
 
     l1: bytes
 
     def __init__(self, l1: bytes):
         self.l1 = l1
-        OrderedDict.__init__(self)
+        dict.__init__(self)
 
     def to_streamdata(self):
-        return self.l1 + b"\r\n" + bytes(b"\r\n").join(
-            b"%s: %s" % (k, v)
-            for k, v in self.items()
-        ) + b"\r\n\r\n"
+        buffer = bytearray(self.l1)
+        buffer += b"\r\n"
+        for k, v in self.items():
+            buffer += k
+            buffer += b": "
+            buffer += v
+            buffer += b"\r\n"
+        buffer += b"\r\n"
+        return bytes(buffer)
 
     @classmethod
     def from_streamdata(cls, data: bytes):
         new = cls(b"")
-        data = data.strip().split(b"\r\n")
-        new.l1 = data[0]
-        for line in data[1:]:
-            k, v = line.split(b": ")
-            new[k.strip()] = v
+        new.l1, fields = _wsframecoder.parse_headers(data)
+        new.update(fields)
         return new
 
 
@@ -91,14 +91,27 @@ class HandshakeRequest(HeaderObj):
         - The result is hashed with the SHA-1 function.
         - A base64 string is then created from the digest and returned as `<String-Out>`.
     """
+
+    _TEMPLATE = (
+        b"GET %s HTTP/%s\r\n"
+        b"Connection: Upgrade\r\n"
+        b"Upgrade: websocket\r\n"
+        b"Sec-WebSocket-Key: %s\r\n"
+        b"Sec-WebSocket-Version: %s\r\n"
+        b"\r\n"
+    )
+    _TEMPLATE_PROTOCOLS = _TEMPLATE[:-2] + b"Sec-WebSocket-Protocol: %s\r\n\r\n"
+
     def __init__(
             self,
-            websocket_b64key: bytes = b64encode(uuid4().__str__().encode()),
+            websocket_b64key: bytes | None = None,
             websocket_version: bytes = b"13",
             websocket_protocols: bytes | None = None,
             resource: bytes = b"/",
             http_version: bytes = b"1.1"
     ):
+        if websocket_b64key is None:
+            websocket_b64key = b64encode(urandom(16))
         super().__init__(b"GET %s HTTP/%s" % (resource, http_version))
         self[b"Connection"] = b"Upgrade"
         self[b"Upgrade"] = b"websocket"
@@ -107,6 +120,25 @@ class HandshakeRequest(HeaderObj):
         if websocket_protocols:
             self[b"Sec-WebSocket-Protocol"] = websocket_protocols
 
+    @classmethod
+    def to_streamdata_fast(
+            cls,
+            websocket_b64key: bytes | None = None,
+            websocket_version: bytes = b"13",
+            websocket_protocols: bytes | None = None,
+            resource: bytes = b"/",
+            http_version: bytes = b"1.1"
+    ) -> bytes:
+        """Create the stream data of a request directly from the template,
+        without creating a ``HandshakeRequest``. The result is identical to
+        ``HandshakeRequest(...).to_streamdata()`` with the same parameters.
+        """
+        if websocket_b64key is None:
+            websocket_b64key = b64encode(urandom(16))
+        if websocket_protocols:
+            return cls._TEMPLATE_PROTOCOLS % (resource, http_version, websocket_b64key, websocket_version, websocket_protocols)
+        return cls._TEMPLATE % (resource, http_version, websocket_b64key, websocket_version)
+
     def make_response(
             self,
             websocket_version: bytes = b"13",
@@ -139,7 +171,7 @@ class CloseCode(int):
         of which the first two bytes are reserved for the numeric code and the rest for
         a text message. The transmission of an additional message to the code is usually omitted.
         """
-        return self.to_bytes(2, "big") + message_maximal123bytes
+        return (_CLOSE_CODE_PREFIXES.get(self) or self.to_bytes(2, "big")) + message_maximal123bytes
 
 
 class CLOSECODES:
@@ -168,12 +200,22 @@ class CLOSECODES:
     _4000to4999_forApplications = range(4000, 5000)
 
 
-def get_close_code_and_message_from_frame(frame: Frame) -> tuple[int, bytes]:
+_CLOSE_CODE_PREFIXES: dict[int, bytes] = {
+    int(code): code.to_bytes(2, "big")
+    for code in vars(CLOSECODES).values()
+    if isinstance(code, CloseCode)
+}
+
+
+def get_close_code_and_message_from_frame(frame: Frame) -> tuple[int, memoryview]:
     """According to RFC6455, the payload must not exceed a total length of 125 bytes,
     of which the first two bytes are reserved for the numeric code and the rest for
     a text message. The transmission of an additional message to the code is usually omitted.
+
+    The message is returned as a ``memoryview`` of the payload (use ``bytes(message)`` for a copy).
     """
-    return int.from_bytes(frame.payload[:2], "big"), frame.payload[2:]
+    payload = memoryview(frame.payload)
+    return int.from_bytes(payload[:2], "big"), payload[2:]
 
 
 class Frame(NamedTuple):
@@ -209,7 +251,7 @@ class Frame(NamedTuple):
 
     **note**: the fields `amount` and `amount_spec` are set by ``from_streamdata`` but are irrelevant for ``to_streamdata``.
 
-    - `payload`: bytes
+    - `payload`: bytes | bytearray | memoryview
     - `opcode`: int = OPCODES.TEXT
         message type
     - `mask`: bytes | None = None
@@ -239,7 +281,7 @@ class Frame(NamedTuple):
         the actual payload size (regardless of the size type)
     """
 
-    payload: bytes
+    payload: bytes | bytearray | memoryview
     opcode: int = OPCODES.TEXT
     """message type"""
     mask: bytes | None = None
@@ -268,53 +310,50 @@ class Frame(NamedTuple):
     """the actual payload size (regardless of the size type)"""
 
     @classmethod
-    def from_streamdata(cls, data: bytes, auto_demask: bool = True) -> Frame:
+    def from_streamdata(cls, data: bytes, auto_demask: bool = True, copy: bool = True) -> Frame:
         """Create the frame object from stream data.
         If `auto_demask` is ``True`` and the mask bit is set,
         unmask the payload directly.
+
+        If `copy` is ``False``, the payload is a ``memoryview`` into `data` instead of a copy,
+        unless it is unmasked here. The view keeps `data` exported (a ``bytearray`` cannot be resized)
+        and reflects later changes to it.
         """
-        (
-            fin,
-            rsv1,
-            rsv2,
-            rsv3,
-            opcode,
-            masked,
-            amount_spec,
-            amount,
-            mask,
-            payload,
-        ) = _wsframecoder.parse(data, auto_demask)
-        return Frame(
-            payload,
-            opcode,
-            (mask if masked else None),
-            fin,
-            rsv1,
-            rsv2,
-            rsv3,
-            amount_spec,
-            amount
-        )
+        return _wsframecoder.parse_frame(cls, data, auto_demask, copy)
 
     def to_streamdata(self) -> bytes:
         """Generate stream data from the frame object.
         Mask the payload if `self.mask` is set.
         """
-        return _wsframecoder.build(
-            self.fin,
-            self.rsv1,
-            self.rsv2,
-            self.rsv3,
-            self.opcode,
-            self.mask or b"",
-            self.payload,
-        )
+        return _wsframecoder.build_frame(self)
+
+    def write_streamdata(self, buffer: bytearray | memoryview, offset: int = 0) -> int:
+        """Write the stream data of the frame object into a writable `buffer` at `offset`,
+        without creating a ``bytes`` object. Mask the payload if `self.mask` is set.
+
+        Return the offset behind the written frame.
+
+        Raises a ``ValueError`` if the frame does not fit into the buffer.
+        """
+        return _wsframecoder.build_into(self, buffer, offset)
+
+    @staticmethod
+    def stream_many(frames: Iterable[Frame]) -> bytes:
+        """Generate the concatenated stream data of multiple frame objects in one call.
+        The result is identical to ``b"".join(frame.to_streamdata() for frame in frames)``.
+        """
+        return _wsframecoder.build_many(frames)
 
     def masked_payload(self) -> bytes:
         """Apply the `self.mask` to the `self.payload`.
         """
-        return _wsframecoder.masking(self.payload, self.mask or b"")
+        return _wsframecoder.mask_frame(self)
+
+    def demask_inplace(self) -> None:
+        """Apply the `self.mask` to the `self.payload` in place.
+        The payload must be a writable buffer (e.g. a ``bytearray`` from a ``BufferedProtocol``).
+        """
+        _wsframecoder.masking_inplace(cast("bytearray | memoryview", self.payload), self.mask or b"")
 
 
 class ProgressiveStreamReader:
@@ -476,48 +515,62 @@ class ProgressiveStreamReader:
         self._make_frame_ = _make_frame
 
 
+StreamReader = ProgressiveStreamReader
+
+
+# ``Frame`` is immutable, the constant control frames can be shared
+_PING_FRAME = Frame(b'', OPCODES.PING)
+_PONG_FRAME = Frame(b'', OPCODES.PONG)
+_NORMAL_CLOSURE_FRAME = Frame(CLOSECODES.NORMAL_CLOSURE.to_payload(), OPCODES.CLOSE)
+
+_PING_STREAMDATA = _PING_FRAME.to_streamdata()
+_PONG_STREAMDATA = _PONG_FRAME.to_streamdata()
+
+# fragment -> (opcode, fin)
+_TEXT_FRAGMENTS = {
+    "first": (OPCODES.TEXT, 0),
+    "continue": (OPCODES.CONTINUE, 0),
+    "final": (OPCODES.CONTINUE, 1),
+    None: (OPCODES.TEXT, 1),
+}
+_BINARY_FRAGMENTS = {
+    "first": (OPCODES.BINARY, 0),
+    "continue": (OPCODES.CONTINUE, 0),
+    "final": (OPCODES.CONTINUE, 1),
+    None: (OPCODES.BINARY, 1),
+}
+
+
 class FrameFactory:
 
     @staticmethod
     def TextDataFrame(message: bytes, mask: bytes | None = None, fragment: Literal["first", "continue", "final"] | None = None) -> Frame:
-        if fragment == "first":
-            opcode = OPCODES.TEXT
-            fin = 0
-        elif fragment == "continue":
-            opcode = OPCODES.CONTINUE
-            fin = 0
-        elif fragment == "final":
-            opcode = OPCODES.CONTINUE
-            fin = 1
-        else:
-            opcode = OPCODES.TEXT
-            fin = 1
+        opcode, fin = _TEXT_FRAGMENTS[fragment]
         return Frame(message, opcode, mask, fin)
 
     @staticmethod
     def BinaryDataFrame(message: bytes, mask: bytes | None = None, fragment: Literal["first", "continue", "final"] | None = None) -> Frame:
-        if fragment == "first":
-            opcode = OPCODES.BINARY
-            fin = 0
-        elif fragment == "continue":
-            opcode = OPCODES.CONTINUE
-            fin = 0
-        elif fragment == "final":
-            opcode = OPCODES.CONTINUE
-            fin = 1
-        else:
-            opcode = OPCODES.BINARY
-            fin = 1
+        opcode, fin = _BINARY_FRAGMENTS[fragment]
         return Frame(message, opcode, mask, fin)
 
     @staticmethod
     def PingFrame() -> Frame:
-        return Frame(b'', OPCODES.PING)
+        return _PING_FRAME
+
+    @staticmethod
+    def PingFrameBytes() -> bytes:
+        return _PING_STREAMDATA
 
     @staticmethod
     def PongFrame() -> Frame:
-        return Frame(b'', OPCODES.PONG)
+        return _PONG_FRAME
+
+    @staticmethod
+    def PongFrameBytes() -> bytes:
+        return _PONG_STREAMDATA
 
     @staticmethod
     def CloseFrame(close_code: CloseCode, message_maximal123bytes: bytes = b"") -> Frame:
+        if close_code == CLOSECODES.NORMAL_CLOSURE and not message_maximal123bytes:
+            return _NORMAL_CLOSURE_FRAME
         return Frame(close_code.to_payload(message_maximal123bytes[:123]), OPCODES.CLOSE)
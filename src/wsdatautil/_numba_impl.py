@@ -0,0 +1,15 @@
+"""
+Numba compiled masking kernel for the pure Python fallback.
+
+Only imported if NumPy is installed and the environment variable ``WSDATAUTIL_NUMBA=1`` is set.
+"""
+
+from numba import njit, prange
+from numpy import uint64
+from numpy.typing import NDArray
+
+
+@njit(parallel=True, cache=True, boundscheck=False)
+def mask_words(words: NDArray[uint64], mask_64: uint64, out: NDArray[uint64]) -> None:
+    for i in prange(words.shape[0]):
+        out[i] = words[i] ^ mask_64
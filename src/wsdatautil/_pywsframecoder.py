@@ -0,0 +1,320 @@
+"""
+Pure Python implementation of the ``_wsframecoder`` interface.
+
+Used when the C extension is not available (e.g. built with ``BUILD_EXTENSION=0``).
+The masking of larger payloads is done with NumPy, if installed, otherwise with Python integers.
+With NumPy and ``WSDATAUTIL_NUMBA=1`` in the environment, a Numba compiled kernel is used instead, if Numba is installed.
+"""
+
+from __future__ import annotations
+
+from base64 import b64encode
+from os import environ
+from hashlib import sha1
+from struct import Struct
+from types import ModuleType
+from typing import Any, Callable, Iterable, Optional, TypeVar, Union
+
+numpy: Optional[ModuleType]
+try:
+    import numpy as _numpy
+except ImportError:
+    numpy = None
+else:
+    numpy = _numpy
+
+_numba_mask_words: Optional[Callable[..., None]] = None
+if numpy is not None and environ.get("WSDATAUTIL_NUMBA") == "1":
+    try:
+        from . import _numba_impl
+    except ImportError:  # Numba is not installed, NumPy is used
+        pass
+    else:
+        _numba_mask_words = _numba_impl.mask_words
+
+
+_T = TypeVar("_T", bound=tuple[Any, ...])
+
+_Buffer = Union[bytes, bytearray, memoryview]
+_WritableBuffer = Union[bytearray, memoryview]
+
+
+if _numba_mask_words is not None:
+    MASKING_KERNEL = "numba"
+elif numpy is not None:
+    MASKING_KERNEL = "numpy"
+else:
+    MASKING_KERNEL = "bigint"
+
+_ACCEPT_KEY_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# precompiled header formats: (b1, b2[, extended amount])
+_HDR_SMALL = Struct("!BB")
+_HDR_16 = Struct("!BBH")
+_HDR_64 = Struct("!BBQ")
+
+# below this payload length the setup of the NumPy arrays does not pay off
+_MASKING_NUMPY_THRESHOLD = 64
+
+
+def _masking_bigint(payload: _Buffer, mask: bytes) -> bytes:
+    # one XOR of two integers over the whole payload, evaluated in C over the digits of the ints
+    amount = len(payload)
+    tiled_mask = mask * (amount // 4) + mask[:amount & 3]
+    return (int.from_bytes(payload, "little") ^ int.from_bytes(tiled_mask, "little")).to_bytes(amount, "little")
+
+
+def _masking_numpy(payload: _Buffer, mask: bytes) -> bytes:
+    assert numpy is not None  # checked by _masking
+    words = len(payload) // 8
+    # the mask is read in the native byte order, like the payload
+    mask_64 = numpy.frombuffer(mask * 2, dtype=numpy.uint64)
+    if _numba_mask_words is None:
+        body = numpy.bitwise_xor(numpy.frombuffer(payload, dtype=numpy.uint64, count=words), mask_64)
+    else:
+        body = numpy.empty(words, dtype=numpy.uint64)
+        _numba_mask_words(numpy.frombuffer(payload, dtype=numpy.uint64, count=words), mask_64[0], body)
+    head: bytes = body.tobytes()
+    # the tail starts at a multiple of 8, so at mask[0]
+    return head + _masking_bigint(memoryview(payload)[words * 8:], mask)
+
+
+def _masking(payload: _Buffer, mask: bytes) -> bytes:
+    if numpy is not None and len(payload) >= _MASKING_NUMPY_THRESHOLD:
+        return _masking_numpy(payload, mask)
+    return _masking_bigint(payload, mask)
+
+
+def _check_mask(mask: bytes | None) -> bytes:
+    if mask is None or len(mask) != 4:
+        raise ValueError("invalid mask: length != 4")
+    return mask
+
+
+def _check_frame(frame: tuple[Any, ...]) -> None:
+    if not isinstance(frame, tuple) or len(frame) < 7:
+        raise TypeError("invalid frame: not a Frame tuple")
+
+
+def _header_continuation(amount_spec: int, masked: int) -> int:
+    header_continuation = 0
+    if amount_spec == 126:
+        header_continuation += 2
+    elif amount_spec == 127:
+        header_continuation += 8
+    if masked:
+        header_continuation += 4
+    return header_continuation
+
+
+def _parse_frame_header(data: _Buffer) -> tuple[int, int, int, int, int, int, int, int, bytes, int]:
+    data_len = len(data)
+    if data_len < 2:
+        raise ValueError("invalid frame: data length < 2")
+
+    b1, b2 = _HDR_SMALL.unpack_from(data)
+    masked = (b2 & 0b10000000) >> 7
+    amount_spec = b2 & 0b01111111
+
+    header_size = 2 + _header_continuation(amount_spec, masked)
+    if data_len < header_size:
+        raise ValueError(f"invalid frame: data length ({data_len}) < header length ({header_size})")
+
+    payload_offset = 2
+    if amount_spec == 126:
+        amount = _HDR_16.unpack_from(data)[2]
+        payload_offset += 2
+    elif amount_spec == 127:
+        amount = _HDR_64.unpack_from(data)[2]
+        payload_offset += 8
+    else:
+        amount = amount_spec
+
+    if masked:
+        mask = bytes(data[payload_offset:payload_offset + 4])
+        payload_offset += 4
+    else:
+        mask = b"\x00\x00\x00\x00"
+
+    expected_len = payload_offset + amount
+    if expected_len != data_len:
+        raise ValueError(f"invalid frame: data length ({data_len}) != expected data length ({expected_len})")
+
+    return (
+        (b1 & 0b10000000) >> 7,
+        (b1 & 0b01000000) >> 6,
+        (b1 & 0b00100000) >> 5,
+        (b1 & 0b00010000) >> 4,
+        b1 & 0b00001111,
+        masked,
+        amount_spec,
+        amount,
+        mask,
+        payload_offset,
+    )
+
+
+def _parse_frame_payload(data: _Buffer, payload_offset: int, masked: int, mask: bytes, auto_demask: bool) -> bytes:
+    payload = memoryview(data)[payload_offset:]
+    if auto_demask and masked:
+        return _masking(payload, mask)
+    return bytes(payload)
+
+
+def _parse_frame_payload_view(data: _Buffer, payload_offset: int) -> bytes | memoryview:
+    view = memoryview(data)
+    if view.ndim != 1 or view.itemsize != 1:
+        return bytes(view[payload_offset:])
+    return view[payload_offset:]
+
+
+def parse(streamdata: _Buffer, auto_demask: bool) -> tuple[int, int, int, int, int, int, int, int, bytes, bytes]:
+    fin, rsv1, rsv2, rsv3, opcode, masked, amount_spec, amount, mask, payload_offset = _parse_frame_header(streamdata)
+    payload = _parse_frame_payload(streamdata, payload_offset, masked, mask, auto_demask)
+    return fin, rsv1, rsv2, rsv3, opcode, masked, amount_spec, amount, mask, payload
+
+
+def parse_frame(frame_type: type[_T], streamdata: _Buffer, auto_demask: bool, copy: bool = True, /) -> _T:
+    if not isinstance(frame_type, type) or not issubclass(frame_type, tuple):
+        raise TypeError("invalid frame type: not a tuple subclass")
+    fin, rsv1, rsv2, rsv3, opcode, masked, amount_spec, amount, mask, payload_offset = _parse_frame_header(streamdata)
+    payload: bytes | memoryview
+    if copy or (auto_demask and masked):
+        payload = _parse_frame_payload(streamdata, payload_offset, masked, mask, auto_demask)
+    else:
+        payload = _parse_frame_payload_view(streamdata, payload_offset)
+    # like the C implementation, bypass a __new__ of the tuple subclass
+    return tuple.__new__(frame_type, (
+        payload, opcode, mask if masked else None, fin, rsv1, rsv2, rsv3, amount_spec, amount
+    ))
+
+
+def _build_header(fin: int, rsv1: int, rsv2: int, rsv3: int, opcode: int, mask: bytes | None, amount: int) -> tuple[bytes, bytes]:
+    if mask is None:
+        mask = b""
+    if len(mask) == 4:
+        masked = 0b10000000
+    elif len(mask) == 0:
+        masked = 0b00000000
+    else:
+        raise ValueError("invalid mask: length != 4")
+
+    b1 = opcode & 0b00001111
+    if fin:
+        b1 |= 0b10000000
+    if rsv1:
+        b1 |= 0b01000000
+    if rsv2:
+        b1 |= 0b00100000
+    if rsv3:
+        b1 |= 0b00010000
+
+    if amount <= 125:
+        header = _HDR_SMALL.pack(b1, masked | amount)
+    elif amount <= 65535:
+        header = _HDR_16.pack(b1, masked | 126, amount)
+    else:
+        header = _HDR_64.pack(b1, masked | 127, amount)
+
+    # the mask is part of the header, an empty mask means unmasked
+    return header + mask, mask
+
+
+def build(fin: int, rsv1: int, rsv2: int, rsv3: int, opcode: int, mask: bytes | None, payload: _Buffer, /) -> bytes:
+    header, mask = _build_header(fin, rsv1, rsv2, rsv3, opcode, mask, len(payload))
+    if mask:
+        return header + _masking(payload, mask)
+    return header + payload
+
+
+def build_frame(frame: tuple[Any, ...], /) -> bytes:
+    _check_frame(frame)
+    payload, opcode, mask, fin, rsv1, rsv2, rsv3 = frame[:7]
+    return build(fin, rsv1, rsv2, rsv3, opcode, mask, payload)
+
+
+def build_into(frame: tuple[Any, ...], buffer: _WritableBuffer, offset: int = 0, /) -> int:
+    _check_frame(frame)
+    payload, opcode, mask, fin, rsv1, rsv2, rsv3 = frame[:7]
+    header, mask = _build_header(fin, rsv1, rsv2, rsv3, opcode, mask, len(payload))
+    header_end = offset + len(header)
+    end = header_end + len(payload)
+    if offset < 0 or end > len(buffer):
+        raise ValueError(
+            f"invalid buffer: buffer length ({len(buffer)}) < offset ({offset}) + frame length ({end - offset})"
+        )
+    buffer[offset:header_end] = header
+    buffer[header_end:end] = _masking(payload, mask) if mask else payload
+    return end
+
+
+def build_many(frames: Iterable[tuple[Any, ...]], /) -> bytes:
+    return b"".join([build_frame(frame) for frame in frames])
+
+
+def masking(payload: _Buffer, mask: bytes, /) -> bytes:
+    return _masking(payload, _check_mask(mask))
+
+
+def masking_inplace(buffer: _WritableBuffer, mask: bytes, /) -> None:
+    buffer[:] = _masking(buffer, _check_mask(mask))
+
+
+def mask_frame(frame: tuple[Any, ...], /) -> bytes:
+    _check_frame(frame)
+    return masking(frame[0], frame[2])
+
+
+def accept_key(websocket_b64key: _Buffer, /) -> bytes:
+    key_hash = sha1(websocket_b64key)
+    key_hash.update(_ACCEPT_KEY_GUID)
+    return b64encode(key_hash.digest())
+
+
+def parse_headers(streamdata: _Buffer, /) -> tuple[bytes, list[tuple[bytes, bytes]]]:
+    l1, *lines = bytes(streamdata).strip().split(b"\r\n")
+    fields = []
+    for line in lines:
+        separator = line.find(b": ")
+        if separator == -1:
+            raise ValueError("invalid header field: missing separator")
+        fields.append((line[:separator].strip(), line[separator + 2:]))
+    return l1, fields
+
+
+def read_header(two_bytes: _Buffer, /) -> tuple[int, int, int, int, int, int, int, int]:
+    if len(two_bytes) != 2:
+        raise ValueError("invalid header: data length != 2")
+    b1 = two_bytes[0]
+    b2 = two_bytes[1]
+    masked = (b2 & 0b10000000) >> 7
+    amount_spec = b2 & 0b01111111
+    return (
+        (b1 & 0b10000000) >> 7,
+        (b1 & 0b01000000) >> 6,
+        (b1 & 0b00100000) >> 5,
+        (b1 & 0b00010000) >> 4,
+        b1 & 0b00001111,
+        masked,
+        amount_spec,
+        _header_continuation(amount_spec, masked),
+    )
+
+
+def read_header_continuation(continuation_bytes: _Buffer, amount_spec: int, masked: bool, /) -> tuple[bytes, int]:
+    expected_len = _header_continuation(amount_spec, masked)
+    if len(continuation_bytes) != expected_len:
+        raise ValueError(
+            f"invalid header: data length ({len(continuation_bytes)}) != expected data length ({expected_len})"
+        )
+    if amount_spec == 126:
+        amount = int.from_bytes(continuation_bytes[:2], "big")
+    elif amount_spec == 127:
+        amount = int.from_bytes(continuation_bytes[:8], "big")
+    else:
+        amount = amount_spec
+    if masked:
+        mask = bytes(continuation_bytes[-4:])
+    else:
+        mask = b"\x00\x00\x00\x00"
+    return mask, amount
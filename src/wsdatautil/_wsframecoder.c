@@ -1,74 +1,30 @@
-#define PY_SSIZE_T_CLEAN
-#include <Python.h>
-
-#if __ARM_NEON
-#include <arm_neon.h>
-#elif __SSE2__
-#include <emmintrin.h>
-#endif
+#include "_wsframecoder.h"
 
 
-static char * _masking(char *input, Py_ssize_t len, char *mask) {
-    Py_ssize_t i = 0;
+// from this payload length on the GIL is released while masking, the buffers stay exported
+#ifndef WSFC_MASKING_NOGIL_THRESHOLD
+#define WSFC_MASKING_NOGIL_THRESHOLD 65536
+#endif
 
-    char *output = (char*)malloc(len * sizeof(char));
-    if (output == NULL) {
-        PyErr_Format(
-            PyExc_SystemError,
-            "Memory allocation failed"
-        );
-        return NULL;
-    };
-    char *p_output = output;
-    
-    {
-#if __ARM_NEON
-        Py_ssize_t input_len_128 = len & ~15;
-        uint8x16_t mask_128 = vreinterpretq_u8_u32(vdupq_n_u32(*(uint32_t *)mask));
-        for (; i < input_len_128; i += 16) {
-            uint8x16_t in_128 = vld1q_u8((uint8_t *)(input + i));
-            uint8x16_t out_128 = veorq_u8(in_128, mask_128);
-            vst1q_u8((uint8_t *)(output + i), out_128);
-        }
-#elif __SSE2__
-        Py_ssize_t input_len_128 = len & ~15;
-        __m128i mask_128 = _mm_set1_epi32(*(uint32_t *)mask);
-
-        for (; i < input_len_128; i += 16) {
-            __m128i in_128 = _mm_loadu_si128((__m128i *)(input + i));
-            __m128i out_128 = _mm_xor_si128(in_128, mask_128);
-            _mm_storeu_si128((__m128i *)(output + i), out_128);
-        }
-#else
-        Py_ssize_t input_len_64 = len & ~7;
-        uint32_t mask_32 = *(uint32_t *)mask;
-        uint64_t mask_64 = ((uint64_t)mask_32 << 32) | (uint64_t)mask_32;
 
-        for (; i < input_len_64; i += 8) {
-            *(uint64_t *)(output + i) = *(uint64_t *)(input + i) ^ mask_64;
-        }
-#endif
-    }
-    
-    for (; i < len; i++) {
-        output[i] = input[i] ^ mask[i & 3];
+static void _masking(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    if (len < WSFC_MASKING_NOGIL_THRESHOLD) {
+        _wsfc_masking(output, input, len, mask);
+        return;
     }
-    return p_output;
+    Py_BEGIN_ALLOW_THREADS
+    _wsfc_masking(output, input, len, mask);
+    Py_END_ALLOW_THREADS
 }
 
 
-static PyObject * masking(PyObject *self, PyObject *args) {
-    PyObject  *i_payload;
-    PyObject  *i_mask;
-
-    if (!PyArg_ParseTuple(args, "OO", &i_payload, &i_mask)) {
-        return NULL;
-    }
-
+static PyObject * _masking_object(PyObject *i_payload, PyObject *i_mask) {
     char       *mask;
     Py_ssize_t  mask_len;
     
-    if (PyBytes_AsStringAndSize(i_mask, &mask, &mask_len) == -1) {
+    if (i_mask == Py_None) {
+        mask_len = 0;
+    } else if (PyBytes_AsStringAndSize(i_mask, &mask, &mask_len) == -1) {
         return NULL;
     }
     
@@ -80,41 +36,78 @@ static PyObject * masking(PyObject *self, PyObject *args) {
         return NULL;
     }
 
-    char       *payload;
-    Py_ssize_t  payload_len;
+    Py_buffer payload;
 
-    if (PyBytes_AsStringAndSize(i_payload, &payload, &payload_len) == -1) {
+    if (PyObject_GetBuffer(i_payload, &payload, PyBUF_SIMPLE) == -1) {
         return NULL;
     }
 
-    char *o_obj_data = _masking(payload, payload_len, mask);
-    if (o_obj_data == NULL) {
-        return NULL;
+    PyObject *o_obj = PyBytes_FromStringAndSize(NULL, payload.len);
+    if (o_obj != NULL) {
+        _masking(PyBytes_AS_STRING(o_obj), payload.buf, payload.len, mask);
     }
-    PyObject *o_obj = PyBytes_FromStringAndSize(o_obj_data, payload_len);
-    free(o_obj_data);
+    PyBuffer_Release(&payload);
     return o_obj;
 }
 
 
-static PyObject * build(PyObject *self, PyObject *args) {
-    uint8_t  i_fin;
-    uint8_t  i_rsv1;
-    uint8_t  i_rsv2;
-    uint8_t  i_rsv3;
-    uint8_t  i_opcode;
-    PyObject *i_mask = NULL;
-    PyObject *i_payload = NULL;
+static PyObject * masking_inplace(PyObject *self, PyObject *args) {
+    Py_buffer   i_buffer;
+    char       *mask;
+    Py_ssize_t  mask_len;
 
-    if (!PyArg_ParseTuple(args, "ppppiOO", &i_fin, &i_rsv1, &i_rsv2, &i_rsv3, &i_opcode, &i_mask, &i_payload)) {
+    if (!PyArg_ParseTuple(args, "w*y#", &i_buffer, &mask, &mask_len)) {
         return NULL;
     }
-    
+
+    if (mask_len != 4) {
+        PyErr_Format(
+            PyExc_ValueError,
+            "invalid mask: length != 4"
+        );
+        PyBuffer_Release(&i_buffer);
+        return NULL;
+    }
+
+    // the kernels read and write strictly ascending, input and output may be identical
+    _masking(i_buffer.buf, i_buffer.buf, i_buffer.len, mask);
+
+    PyBuffer_Release(&i_buffer);
+    Py_RETURN_NONE;
+}
+
+
+static PyObject * masking(PyObject *self, PyObject *args) {
+    PyObject  *i_payload;
+    PyObject  *i_mask;
+
+    if (!PyArg_ParseTuple(args, "OO", &i_payload, &i_mask)) {
+        return NULL;
+    }
+
+    return _masking_object(i_payload, i_mask);
+}
+
+
+typedef struct {
+    uint8_t    b1;
+    uint8_t    b2;
+    int        amount_spec_len;
+    char      *mask;
+    Py_buffer  payload;
+} _frame_build;
+
+
+// acquires `build->payload`, release with PyBuffer_Release when the return value is 0
+static int _build_prepare(_frame_build *build, int i_fin, int i_rsv1, int i_rsv2, int i_rsv3, int i_opcode, PyObject *i_mask, PyObject *i_payload) {
     char       *mask;
     Py_ssize_t  mask_len;
 
-    if (PyBytes_AsStringAndSize(i_mask, &mask, &mask_len) == -1) {
-        return NULL;
+    if (i_mask == Py_None) {
+        mask = NULL;
+        mask_len = 0;
+    } else if (PyBytes_AsStringAndSize(i_mask, &mask, &mask_len) == -1) {
+        return -1;
     }
 
     uint8_t masked;
@@ -122,115 +115,304 @@ static PyObject * build(PyObject *self, PyObject *args) {
         masked = 0b10000000;
     } else if (mask_len == 0) {
         masked = 0b00000000;
+        mask = NULL;
     } else {
         PyErr_Format(
             PyExc_ValueError,
             "invalid mask: length != 4"
         );
-        return NULL;
+        return -1;
     }
 
-    char       *payload;
-    Py_ssize_t  amount;
-    
-    if (PyBytes_AsStringAndSize(i_payload, &payload, &amount) == -1) {
-        return NULL;
+    if (PyObject_GetBuffer(i_payload, &build->payload, PyBUF_SIMPLE) == -1) {
+        return -1;
     }
-    
-    int header_offset = 2;
-    
+
+    Py_ssize_t amount = build->payload.len;
+
     uint8_t amount_spec;
-    int _amount_spec_len;
     if (amount <= 125) {
         amount_spec = amount;
-        _amount_spec_len = 0;
+        build->amount_spec_len = 0;
     } else if (amount <= 65535) {
         amount_spec = 0b01111110;
-        _amount_spec_len = 2;
+        build->amount_spec_len = 2;
     } else {
         amount_spec = 0b01111111;
-        _amount_spec_len = 8;
+        build->amount_spec_len = 8;
     }
-    
-    int total_amount = header_offset + _amount_spec_len + mask_len + amount;
-    PyObject *o_obj = PyBytes_FromStringAndSize(NULL, total_amount);
-    if (o_obj == NULL) {
-        PyErr_Format(
-            PyExc_SystemError,
-            "could not create PyBytes"
-        );
-        return NULL;
-    };
-    char *o_obj_data = PyBytes_AS_STRING(o_obj);
-    
+
+    uint8_t b1 = i_opcode & 0b00001111;
     if (i_fin) {
-        i_fin = 0b10000000;
+        b1 |= 0b10000000;
     }
     if (i_rsv1) {
-        i_rsv1 = 0b01000000;
+        b1 |= 0b01000000;
     }
     if (i_rsv2) {
-        i_rsv2 = 0b00100000;
+        b1 |= 0b00100000;
     }
     if (i_rsv3) {
-        i_rsv3 = 0b00010000;
+        b1 |= 0b00010000;
     }
 
-    o_obj_data[0] = i_fin|i_rsv1|i_rsv2|i_rsv3|i_opcode;
-    o_obj_data[1] = masked | amount_spec;
-    
-    if (_amount_spec_len == 2) {
-        o_obj_data[2] = (amount >> 8)  & 0b11111111;
-        o_obj_data[3] =  amount        & 0b11111111;
-    } else if (_amount_spec_len == 8) {
-        o_obj_data[2] = (amount >> 56) & 0b11111111;
-        o_obj_data[3] = (amount >> 48) & 0b11111111;
-        o_obj_data[4] = (amount >> 40) & 0b11111111;
-        o_obj_data[5] = (amount >> 32) & 0b11111111;
-        o_obj_data[6] = (amount >> 24) & 0b11111111;
-        o_obj_data[7] = (amount >> 16) & 0b11111111;
-        o_obj_data[8] = (amount >> 8)  & 0b11111111;
-        o_obj_data[9] =  amount        & 0b11111111;
-    }
-
-    header_offset += _amount_spec_len;
-    
-    if (masked) {
-        memcpy(o_obj_data + header_offset, mask, 4);
+    build->b1 = b1;
+    build->b2 = masked | amount_spec;
+    build->mask = mask;
+    return 0;
+}
+
+
+static Py_ssize_t _build_size(_frame_build *build) {
+    return 2 + build->amount_spec_len + (build->mask ? 4 : 0) + build->payload.len;
+}
+
+
+// writes exactly _build_size(build) bytes to `output`
+static void _build_write(char *output, _frame_build *build) {
+    Py_ssize_t header_offset = 2;
+
+    output[0] = build->b1;
+    output[1] = build->b2;
+
+    uint64_t _amount = build->payload.len;
+    if (build->amount_spec_len == 2) {
+        output[2] = (_amount >> 8)  & 0b11111111;
+        output[3] =  _amount        & 0b11111111;
+    } else if (build->amount_spec_len == 8) {
+        output[2] = (_amount >> 56) & 0b11111111;
+        output[3] = (_amount >> 48) & 0b11111111;
+        output[4] = (_amount >> 40) & 0b11111111;
+        output[5] = (_amount >> 32) & 0b11111111;
+        output[6] = (_amount >> 24) & 0b11111111;
+        output[7] = (_amount >> 16) & 0b11111111;
+        output[8] = (_amount >> 8)  & 0b11111111;
+        output[9] =  _amount        & 0b11111111;
+    }
+
+    header_offset += build->amount_spec_len;
+
+    if (build->mask) {
+        memcpy(output + header_offset, build->mask, 4);
         header_offset += 4;
-        char *masked_payload = _masking(payload, amount, mask);
-        if (masked_payload == NULL) {
-            PyObject_Del(o_obj);
-            return NULL;
-        }
-        memcpy(o_obj_data + header_offset, masked_payload, amount);
-        free(masked_payload);
+        _masking(output + header_offset, build->payload.buf, build->payload.len, build->mask);
     } else {
-        memcpy(o_obj_data + header_offset, payload, amount);
+        memcpy(output + header_offset, build->payload.buf, build->payload.len);
     }
+}
+
 
+static PyObject * _build(_frame_build *build) {
+    PyObject *o_obj = PyBytes_FromStringAndSize(NULL, _build_size(build));
+    if (o_obj != NULL) {
+        _build_write(PyBytes_AS_STRING(o_obj), build);
+    }
+    PyBuffer_Release(&build->payload);
     return o_obj;
 }
 
-static PyObject * parse(PyObject *self, PyObject *args) {
-    PyObject   *i_obj;
-    Py_ssize_t  i_len;
-    char       *i_data;
-    int         i_autodemask;
 
-    char     *o_mask = NULL;
-    char     *o_masked_payload = NULL;
-    PyObject *o_obj = NULL;
-    
-    if (!PyArg_ParseTuple(args, "Op", &i_obj, &i_autodemask))
-    {
-        goto exit;
+static PyObject * build(PyObject *self, PyObject *args) {
+    int       i_fin;
+    int       i_rsv1;
+    int       i_rsv2;
+    int       i_rsv3;
+    int       i_opcode;
+    PyObject *i_mask = NULL;
+    PyObject *i_payload = NULL;
+
+    if (!PyArg_ParseTuple(args, "ppppiOO", &i_fin, &i_rsv1, &i_rsv2, &i_rsv3, &i_opcode, &i_mask, &i_payload)) {
+        return NULL;
+    }
+
+    _frame_build frame_build;
+    if (_build_prepare(&frame_build, i_fin, i_rsv1, i_rsv2, i_rsv3, i_opcode, i_mask, i_payload) == -1) {
+        return NULL;
+    }
+    return _build(&frame_build);
+}
+
+
+// Frame: (payload, opcode, mask, fin, rsv1, rsv2, rsv3, amount_spec, amount)
+static int _check_frame(PyObject *i_frame) {
+    if (!PyTuple_Check(i_frame) || PyTuple_GET_SIZE(i_frame) < 7) {
+        PyErr_Format(
+            PyExc_TypeError,
+            "invalid frame: not a Frame tuple"
+        );
+        return -1;
+    }
+    return 0;
+}
+
+
+static int _build_prepare_frame(_frame_build *build, PyObject *i_frame) {
+    if (_check_frame(i_frame) == -1) {
+        return -1;
+    }
+
+    int i_fin = PyObject_IsTrue(PyTuple_GET_ITEM(i_frame, 3));
+    int i_rsv1 = PyObject_IsTrue(PyTuple_GET_ITEM(i_frame, 4));
+    int i_rsv2 = PyObject_IsTrue(PyTuple_GET_ITEM(i_frame, 5));
+    int i_rsv3 = PyObject_IsTrue(PyTuple_GET_ITEM(i_frame, 6));
+    if (i_fin == -1 || i_rsv1 == -1 || i_rsv2 == -1 || i_rsv3 == -1) {
+        return -1;
+    }
+
+    int i_opcode = PyLong_AsLong(PyTuple_GET_ITEM(i_frame, 1));
+    if (i_opcode == -1 && PyErr_Occurred()) {
+        return -1;
+    }
+
+    return _build_prepare(
+        build,
+        i_fin, i_rsv1, i_rsv2, i_rsv3, i_opcode,
+        PyTuple_GET_ITEM(i_frame, 2),
+        PyTuple_GET_ITEM(i_frame, 0)
+    );
+}
+
+
+static PyObject * build_frame(PyObject *self, PyObject *args) {
+    PyObject *i_frame;
+
+    if (!PyArg_ParseTuple(args, "O", &i_frame)) {
+        return NULL;
+    }
+
+    _frame_build frame_build;
+    if (_build_prepare_frame(&frame_build, i_frame) == -1) {
+        return NULL;
+    }
+    return _build(&frame_build);
+}
+
+
+static PyObject * build_into(PyObject *self, PyObject *args) {
+    PyObject   *i_frame;
+    Py_buffer   i_buffer;
+    Py_ssize_t  i_offset = 0;
+
+    if (!PyArg_ParseTuple(args, "Ow*|n", &i_frame, &i_buffer, &i_offset)) {
+        return NULL;
     }
 
-    if (PyBytes_AsStringAndSize(i_obj, &i_data, &i_len) == -1) {
+    _frame_build frame_build;
+    if (_build_prepare_frame(&frame_build, i_frame) == -1) {
+        PyBuffer_Release(&i_buffer);
+        return NULL;
+    }
+
+    PyObject   *o_obj = NULL;
+    Py_ssize_t  size = _build_size(&frame_build);
+
+    if (i_offset < 0 || i_offset > i_buffer.len || size > i_buffer.len - i_offset) {
+        PyErr_Format(
+            PyExc_ValueError,
+            "invalid buffer: buffer length (%zd) < offset (%zd) + frame length (%zd)",
+            i_buffer.len, i_offset, size
+        );
         goto exit;
     }
 
+    _build_write((char *)i_buffer.buf + i_offset, &frame_build);
+    o_obj = PyLong_FromSsize_t(i_offset + size);
+
+exit:
+    PyBuffer_Release(&frame_build.payload);
+    PyBuffer_Release(&i_buffer);
+    return o_obj;
+}
+
+
+static PyObject * build_many(PyObject *self, PyObject *args) {
+    PyObject *i_frames;
+
+    if (!PyArg_ParseTuple(args, "O", &i_frames)) {
+        return NULL;
+    }
+
+    PyObject *frames = PySequence_Fast(i_frames, "invalid frames: not iterable");
+    if (frames == NULL) {
+        return NULL;
+    }
+
+    Py_ssize_t n_frames = PySequence_Fast_GET_SIZE(frames);
+    _frame_build *frame_builds = PyMem_New(_frame_build, n_frames ? n_frames : 1);
+    if (frame_builds == NULL) {
+        Py_DECREF(frames);
+        return PyErr_NoMemory();
+    }
+
+    PyObject   *o_obj = NULL;
+    Py_ssize_t  n_prepared = 0;
+    Py_ssize_t  total_amount = 0;
+
+    // first pass: validate the frames and sum up the output length
+    for (; n_prepared < n_frames; n_prepared++) {
+        _frame_build *frame_build = &frame_builds[n_prepared];
+        if (_build_prepare_frame(frame_build, PySequence_Fast_GET_ITEM(frames, n_prepared)) == -1) {
+            goto exit;
+        }
+        Py_ssize_t size = _build_size(frame_build);
+        if (size > PY_SSIZE_T_MAX - total_amount) {
+            n_prepared++;
+            PyErr_NoMemory();
+            goto exit;
+        }
+        total_amount += size;
+    }
+
+    // second pass: write the frames into a single buffer
+    o_obj = PyBytes_FromStringAndSize(NULL, total_amount);
+    if (o_obj != NULL) {
+        char *o_obj_data = PyBytes_AS_STRING(o_obj);
+        for (Py_ssize_t i = 0; i < n_frames; i++) {
+            _build_write(o_obj_data, &frame_builds[i]);
+            o_obj_data += _build_size(&frame_builds[i]);
+        }
+    }
+
+exit:
+    for (Py_ssize_t i = 0; i < n_prepared; i++) {
+        PyBuffer_Release(&frame_builds[i].payload);
+    }
+    PyMem_Free(frame_builds);
+    Py_DECREF(frames);
+    return o_obj;
+}
+
+
+static PyObject * mask_frame(PyObject *self, PyObject *args) {
+    PyObject *i_frame;
+
+    if (!PyArg_ParseTuple(args, "O", &i_frame)) {
+        return NULL;
+    }
+
+    if (_check_frame(i_frame) == -1) {
+        return NULL;
+    }
+
+    return _masking_object(PyTuple_GET_ITEM(i_frame, 0), PyTuple_GET_ITEM(i_frame, 2));
+}
+
+
+typedef struct {
+    int        fin;
+    int        rsv1;
+    int        rsv2;
+    int        rsv3;
+    int        opcode;
+    int        masked;
+    int        amount_spec;
+    uint64_t   amount;
+    char       mask[4];
+    Py_ssize_t payload_offset;
+} _frame_header;
+
+
+static int _parse_frame_header(const unsigned char *_input, Py_ssize_t i_len, _frame_header *header) {
     uint64_t _header_offset = 2;
     
     if ((uint64_t)i_len < _header_offset) {
@@ -238,28 +420,45 @@ static PyObject * parse(PyObject *self, PyObject *args) {
             PyExc_ValueError,
             "invalid frame: data length < 2"
         );
-        goto exit;
+        return -1;
     }
 
-    unsigned char *_input = (unsigned char *)i_data;
-
     char _b1 = _input[0];
-    int      fin         = (_b1 & 0b10000000) >> 7;
-    int      rsv1        = (_b1 & 0b01000000) >> 6;
-    int      rsv2        = (_b1 & 0b00100000) >> 5;
-    int      rsv3        = (_b1 & 0b00010000) >> 4;
-    int      opcode      = (_b1 & 0b00001111);
+    header->fin         = (_b1 & 0b10000000) >> 7;
+    header->rsv1        = (_b1 & 0b01000000) >> 6;
+    header->rsv2        = (_b1 & 0b00100000) >> 5;
+    header->rsv3        = (_b1 & 0b00010000) >> 4;
+    header->opcode      = (_b1 & 0b00001111);
     char _b2 = _input[1];
-    int      masked      = (_b2 & 0b10000000) >> 7;
-    int      amount_spec = (_b2 & 0b01111111);
+    header->masked      = (_b2 & 0b10000000) >> 7;
+    header->amount_spec = (_b2 & 0b01111111);
+
+    uint64_t _header_size = _header_offset;
+    if (header->amount_spec == 126) {
+        _header_size += 2;
+    } else if (header->amount_spec == 127) {
+        _header_size += 8;
+    }
+    if (header->masked) {
+        _header_size += 4;
+    }
+    if ((uint64_t)i_len < _header_size) {
+        PyErr_Format(
+            PyExc_ValueError,
+            "invalid frame: data length (%zd) < header length (%d)",
+            i_len, (int)_header_size
+        );
+        return -1;
+    }
+
     uint64_t amount;
     
-    if (amount_spec == 126) {
+    if (header->amount_spec == 126) {
         amount =  (uint64_t)_input[2];
         amount <<= 8;
         amount |= (uint64_t)_input[3];
         _header_offset += 2;
-    } else if (amount_spec == 127) {
+    } else if (header->amount_spec == 127) {
         amount =  (uint64_t)_input[2];
         amount <<= 8;
         amount |= (uint64_t)_input[3];
@@ -277,71 +476,190 @@ static PyObject * parse(PyObject *self, PyObject *args) {
         amount |= (uint64_t)_input[9];
         _header_offset += 8;
     } else {
-        amount = amount_spec;
+        amount = header->amount_spec;
     }
     
-    o_mask = (char*)malloc(4 * sizeof(char));
-    if (o_mask == NULL) {
-        PyErr_Format(
-            PyExc_SystemError,
-            "Memory allocation failed"
-        );
-        goto exit;
-    };
-    if (masked) {
-        memcpy(o_mask, _input + _header_offset, 4);
+    if (header->masked) {
+        memcpy(header->mask, _input + _header_offset, 4);
         _header_offset += 4;
+    } else {
+        memset(header->mask, 0, 4);
     }
 
     uint64_t _edl = _header_offset + amount;
     if (_edl != (uint64_t)i_len) {
         PyErr_Format(
             PyExc_ValueError,
-            "invalid frame: data length (%d) != expected data length (%d)",
-            i_len, _edl
+            "invalid frame: data length (%zd) != expected data length (%llu)",
+            i_len, (unsigned long long)_edl
         );
-        goto exit;
+        return -1;
     }
 
-    if (i_autodemask & masked) {
-        o_masked_payload = _masking((char*)_input + _header_offset, amount, o_mask);
-        if (o_masked_payload == NULL) {
-            goto exit;
+    header->amount = amount;
+    header->payload_offset = _header_offset;
+    return 0;
+}
+
+
+static PyObject * _parse_frame_payload(const unsigned char *_input, _frame_header *header, int autodemask) {
+    const char *payload = (const char *)_input + header->payload_offset;
+
+    if (autodemask & header->masked) {
+        PyObject *o_payload = PyBytes_FromStringAndSize(NULL, header->amount);
+        if (o_payload == NULL) {
+            return NULL;
         }
-        o_obj = Py_BuildValue(
-            "(i,i,i,i,i,i,i,i,y#,y#)",
-            fin, rsv1, rsv2, rsv3, opcode, masked, amount_spec, amount, o_mask, 4, o_masked_payload, amount
+        _masking(PyBytes_AS_STRING(o_payload), payload, header->amount, header->mask);
+        return o_payload;
+    }
+    return PyBytes_FromStringAndSize(payload, header->amount);
+}
+
+
+static PyObject * _parse_frame_payload_view(Py_buffer *buffer, _frame_header *header) {
+    // a memoryview of the payload in the buffer object, falls back to a copy for non-byte layouts
+    PyObject *o_view = PyMemoryView_FromObject(buffer->obj);
+    if (o_view == NULL) {
+        return NULL;
+    }
+    Py_buffer *view = PyMemoryView_GET_BUFFER(o_view);
+    if (view->ndim != 1 || view->itemsize != 1) {
+        Py_DECREF(o_view);
+        return PyBytes_FromStringAndSize((const char *)buffer->buf + header->payload_offset, header->amount);
+    }
+    PyObject *o_payload = PySequence_GetSlice(
+        o_view, header->payload_offset, header->payload_offset + (Py_ssize_t)header->amount
+    );
+    Py_DECREF(o_view);
+    return o_payload;
+}
+
+
+static PyObject * parse(PyObject *self, PyObject *args) {
+    Py_buffer   i_buffer;
+    int         i_autodemask;
+
+    PyObject *o_payload = NULL;
+    PyObject *o_obj = NULL;
+
+    if (!PyArg_ParseTuple(args, "y*p", &i_buffer, &i_autodemask))
+    {
+        return NULL;
+    }
+
+    unsigned char *_input = (unsigned char *)i_buffer.buf;
+
+    _frame_header header;
+    if (_parse_frame_header(_input, i_buffer.len, &header) == -1) {
+        goto exit;
+    }
+
+    o_payload = _parse_frame_payload(_input, &header, i_autodemask);
+    if (o_payload == NULL) {
+        goto exit;
+    }
+
+    o_obj = Py_BuildValue(
+        "(i,i,i,i,i,i,i,K,y#,N)",
+        header.fin, header.rsv1, header.rsv2, header.rsv3, header.opcode, header.masked,
+        header.amount_spec, (unsigned long long)header.amount, header.mask, 4, o_payload
+    );
+
+exit:
+    PyBuffer_Release(&i_buffer);
+    return o_obj;
+}
+
+
+static PyObject * parse_frame(PyObject *self, PyObject *args) {
+    PyObject   *i_cls;
+    Py_buffer   i_buffer;
+    int         i_autodemask;
+    int         i_copy = 1;
+
+    PyObject *o_obj = NULL;
+
+    if (!PyArg_ParseTuple(args, "Oy*p|p", &i_cls, &i_buffer, &i_autodemask, &i_copy))
+    {
+        return NULL;
+    }
+
+    if (!PyType_Check(i_cls) || !PyType_IsSubtype((PyTypeObject *)i_cls, &PyTuple_Type)) {
+        PyErr_Format(
+            PyExc_TypeError,
+            "invalid frame type: not a tuple subclass"
         );
+        goto exit;
+    }
+
+    unsigned char *_input = (unsigned char *)i_buffer.buf;
+
+    _frame_header header;
+    if (_parse_frame_header(_input, i_buffer.len, &header) == -1) {
+        goto exit;
+    }
+
+    PyTypeObject *o_type = (PyTypeObject *)i_cls;
+    o_obj = o_type->tp_alloc(o_type, 9);
+    if (o_obj == NULL) {
+        goto exit;
+    }
+
+    // (payload, opcode, mask, fin, rsv1, rsv2, rsv3, amount_spec, amount)
+    PyObject *o_payload;
+    if (i_copy || (i_autodemask & header.masked)) {
+        o_payload = _parse_frame_payload(_input, &header, i_autodemask);
     } else {
-        o_obj = Py_BuildValue(
-            "(i,i,i,i,i,i,i,i,y#,y#)",
-            fin, rsv1, rsv2, rsv3, opcode, masked, amount_spec, amount, o_mask, 4, (char*)_input + _header_offset, amount
-        );
+        o_payload = _parse_frame_payload_view(&i_buffer, &header);
+    }
+    if (o_payload == NULL) {
+        Py_CLEAR(o_obj);
+        goto exit;
+    }
+    PyTuple_SET_ITEM(o_obj, 0, o_payload);
+    PyTuple_SET_ITEM(o_obj, 1, PyLong_FromLong(header.opcode));
+    if (header.masked) {
+        PyTuple_SET_ITEM(o_obj, 2, PyBytes_FromStringAndSize(header.mask, 4));
+    } else {
+        Py_INCREF(Py_None);
+        PyTuple_SET_ITEM(o_obj, 2, Py_None);
+    }
+    PyTuple_SET_ITEM(o_obj, 3, PyLong_FromLong(header.fin));
+    PyTuple_SET_ITEM(o_obj, 4, PyLong_FromLong(header.rsv1));
+    PyTuple_SET_ITEM(o_obj, 5, PyLong_FromLong(header.rsv2));
+    PyTuple_SET_ITEM(o_obj, 6, PyLong_FromLong(header.rsv3));
+    PyTuple_SET_ITEM(o_obj, 7, PyLong_FromLong(header.amount_spec));
+    PyTuple_SET_ITEM(o_obj, 8, PyLong_FromUnsignedLongLong(header.amount));
+
+    for (int i = 1; i < 9; i++) {
+        if (PyTuple_GET_ITEM(o_obj, i) == NULL) {
+            Py_CLEAR(o_obj);
+            goto exit;
+        }
     }
 
 exit:
-    free(o_mask);
-    free(o_masked_payload);
+    PyBuffer_Release(&i_buffer);
     return o_obj;
 }
 
 
 
 static PyObject * read_header(PyObject *self, PyObject *args) {
-    PyObject   *i_obj;
+    Py_buffer   i_buffer = {0};
     Py_ssize_t  i_len;
     char       *i_data;
 
     PyObject *o_obj = NULL;
     
-    if (!PyArg_ParseTuple(args, "O", &i_obj))
+    if (!PyArg_ParseTuple(args, "y*", &i_buffer))
     {
         goto exit;
     }
 
-    if (PyBytes_AsStringAndSize(i_obj, &i_data, &i_len) == -1) {
-        goto exit;
-    }
+    i_data = i_buffer.buf;
+    i_len = i_buffer.len;
     
     if ((uint64_t)i_len != 2) {
         PyErr_Format(
@@ -381,13 +699,14 @@ static PyObject * read_header(PyObject *self, PyObject *args) {
     );
 
 exit:
+    PyBuffer_Release(&i_buffer);
     return o_obj;
 }
 
 
 
 static PyObject * read_header_continuation(PyObject *self, PyObject *args) {
-    PyObject   *i_obj;
+    Py_buffer   i_buffer = {0};
     Py_ssize_t  i_len;
     char       *i_data;
     int         i_amount_spec;
@@ -396,18 +715,35 @@ static PyObject * read_header_continuation(PyObject *self, PyObject *args) {
     char     *o_mask = NULL;
     PyObject *o_obj = NULL;
     
-    if (!PyArg_ParseTuple(args, "Oip", &i_obj, &i_amount_spec, &i_masked))
+    if (!PyArg_ParseTuple(args, "y*ip", &i_buffer, &i_amount_spec, &i_masked))
     {
         goto exit;
     }
 
-    if (PyBytes_AsStringAndSize(i_obj, &i_data, &i_len) == -1) {
-        goto exit;
-    }
+    i_data = i_buffer.buf;
+    i_len = i_buffer.len;
 
     unsigned char *_input = (unsigned char *)i_data;
 
     uint64_t _header_size = 0;
+
+    uint64_t _expected_size = 0;
+    if (i_amount_spec == 126) {
+        _expected_size += 2;
+    } else if (i_amount_spec == 127) {
+        _expected_size += 8;
+    }
+    if (i_masked) {
+        _expected_size += 4;
+    }
+    if ((uint64_t)i_len != _expected_size) {
+        PyErr_Format(
+            PyExc_ValueError,
+            "invalid header: data length (%zd) != expected data length (%d)",
+            i_len, (int)_expected_size
+        );
+        goto exit;
+    }
     
     uint64_t amount;
 
@@ -438,7 +774,8 @@ static PyObject * read_header_continuation(PyObject *self, PyObject *args) {
         amount = i_amount_spec;
     }
     
-    o_mask = (char*)malloc(4 * sizeof(char));
+    // zeroed, an unmasked frame gets the mask b"\x00\x00\x00\x00"
+    o_mask = (char*)calloc(4, sizeof(char));
     if (o_mask == NULL) {
         PyErr_Format(
             PyExc_SystemError,
@@ -451,28 +788,169 @@ static PyObject * read_header_continuation(PyObject *self, PyObject *args) {
         _header_size += 4;
     }
 
-    if ((uint64_t)i_len != _header_size) {
-        PyErr_Format(
-            PyExc_ValueError,
-            "invalid header: data length (%d) != expected data length (%d)",
-            i_len, _header_size
-        );
-        goto exit;
-    }
-    
-    
     o_obj = Py_BuildValue(
-        "(y#,i)",
-        o_mask, 4, amount
+        "(y#,K)",
+        o_mask, 4, (unsigned long long)amount
     );
 
 exit:
+    PyBuffer_Release(&i_buffer);
     free(o_mask);
     return o_obj;
 }
 
 
 
+static PyObject * accept_key(PyObject *self, PyObject *args) {
+    PyObject   *i_obj;
+    Py_buffer   i_buffer;
+
+    PyObject *o_obj = NULL;
+
+    if (!PyArg_ParseTuple(args, "O", &i_obj))
+    {
+        return NULL;
+    }
+
+    if (PyObject_GetBuffer(i_obj, &i_buffer, PyBUF_SIMPLE) == -1) {
+        return NULL;
+    }
+
+    char output[28];
+    if (_wsfc_make_accept_key((const char *)i_buffer.buf, i_buffer.len, output) == -1) {
+        goto exit;
+    }
+    o_obj = PyBytes_FromStringAndSize(output, 28);
+
+exit:
+    PyBuffer_Release(&i_buffer);
+    return o_obj;
+}
+
+
+
+static const char * _find_crlf(const char *start, const char *end) {
+    const char *p = start;
+    while (p < end) {
+        const char *lf = (const char *)memchr(p, '\n', end - p);
+        if (lf == NULL) {
+            break;
+        }
+        if (lf > start && lf[-1] == '\r') {
+            return lf - 1;
+        }
+        p = lf + 1;
+    }
+    return end;
+}
+
+
+static const char * _find_field_separator(const char *start, const char *end) {
+    const char *p = start;
+    while (p < end) {
+        const char *colon = (const char *)memchr(p, ':', end - p);
+        if (colon == NULL) {
+            break;
+        }
+        if (colon + 1 < end && colon[1] == ' ') {
+            return colon;
+        }
+        p = colon + 1;
+    }
+    return NULL;
+}
+
+
+static int _is_space(char c) {
+    return c == ' ' || c == '\t' || c == '\n' || c == '\r' || c == '\x0b' || c == '\x0c';
+}
+
+
+static PyObject * parse_headers(PyObject *self, PyObject *args) {
+    Py_buffer   i_buffer = {0};
+    Py_ssize_t  i_len;
+    char       *i_data;
+
+    PyObject *o_l1 = NULL;
+    PyObject *o_fields = NULL;
+    PyObject *o_obj = NULL;
+
+    if (!PyArg_ParseTuple(args, "y*", &i_buffer))
+    {
+        goto exit;
+    }
+
+    i_data = i_buffer.buf;
+    i_len = i_buffer.len;
+
+    const char *start = i_data;
+    const char *end = i_data + i_len;
+
+    while (start < end && _is_space(*start)) {
+        start++;
+    }
+    while (end > start && _is_space(end[-1])) {
+        end--;
+    }
+
+    const char *line_end = _find_crlf(start, end);
+
+    o_l1 = PyBytes_FromStringAndSize(start, line_end - start);
+    if (o_l1 == NULL) {
+        goto exit;
+    }
+    o_fields = PyList_New(0);
+    if (o_fields == NULL) {
+        goto exit;
+    }
+
+    while (line_end < end) {
+        const char *line = line_end + 2;
+        line_end = _find_crlf(line, end);
+
+        const char *separator = _find_field_separator(line, line_end);
+        if (separator == NULL) {
+            PyErr_Format(
+                PyExc_ValueError,
+                "invalid header field: missing separator"
+            );
+            goto exit;
+        }
+
+        const char *key_start = line;
+        const char *key_end = separator;
+        while (key_start < key_end && _is_space(*key_start)) {
+            key_start++;
+        }
+        while (key_end > key_start && _is_space(key_end[-1])) {
+            key_end--;
+        }
+
+        PyObject *field = Py_BuildValue(
+            "(y#,y#)",
+            key_start, key_end - key_start, separator + 2, line_end - (separator + 2)
+        );
+        if (field == NULL) {
+            goto exit;
+        }
+        if (PyList_Append(o_fields, field) == -1) {
+            Py_DECREF(field);
+            goto exit;
+        }
+        Py_DECREF(field);
+    }
+
+    o_obj = PyTuple_Pack(2, o_l1, o_fields);
+
+exit:
+    PyBuffer_Release(&i_buffer);
+    Py_XDECREF(o_l1);
+    Py_XDECREF(o_fields);
+    return o_obj;
+}
+
+
+
 static PyMethodDef wsframecoder_meth[] = {
     {
         "read_header",
@@ -492,18 +970,66 @@ static PyMethodDef wsframecoder_meth[] = {
         METH_VARARGS,
         "parse [and decode] a WebSocket frame <- (streamdata, auto_demask) -> (fin, rsv1, rsv2, rsv3, opcode, masked, amount_spec, amount, mask, payload)",
     },
+    {
+        "parse_frame",
+        (PyCFunction)parse_frame,
+        METH_VARARGS,
+        "parse [and decode] a WebSocket frame into a Frame <- (frame_type, streamdata, auto_demask[, copy]) -> frame_type(payload, opcode, mask, fin, rsv1, rsv2, rsv3, amount_spec, amount)",
+    },
     {
         "build",
         (PyCFunction)build,
         METH_VARARGS,
         "create a WebSocket frame <- (fin, rsv1, rsv2, rsv3, opcode, mask, payload) -> streamdata",
     },
+    {
+        "build_frame",
+        (PyCFunction)build_frame,
+        METH_VARARGS,
+        "create a WebSocket frame from a Frame <- (frame) -> streamdata",
+    },
+    {
+        "build_into",
+        (PyCFunction)build_into,
+        METH_VARARGS,
+        "write a WebSocket frame from a Frame into a writable buffer <- (frame, buffer[, offset]) -> end offset",
+    },
+    {
+        "build_many",
+        (PyCFunction)build_many,
+        METH_VARARGS,
+        "create the concatenated WebSocket frames from Frames <- ([frame, ...]) -> streamdata",
+    },
     {
         "masking",
         (PyCFunction)masking,
         METH_VARARGS,
         "apply masking to a WebSocket payload <- (payload, mask) -> payload",
     },
+    {
+        "mask_frame",
+        (PyCFunction)mask_frame,
+        METH_VARARGS,
+        "apply the masking of a Frame to its payload <- (frame) -> payload",
+    },
+    {
+        "masking_inplace",
+        (PyCFunction)masking_inplace,
+        METH_VARARGS,
+        "apply masking to a writable buffer in place <- (buffer, mask) -> None",
+    },
+    {
+        "accept_key",
+        (PyCFunction)accept_key,
+        METH_VARARGS,
+        "create the value of Sec-WebSocket-Accept <- (Sec-WebSocket-Key) -> Sec-WebSocket-Accept",
+    },
+    {
+        "parse_headers",
+        (PyCFunction)parse_headers,
+        METH_VARARGS,
+        "parse an HTTP header <- (streamdata) -> (first_line, [(key, value), ...])",
+    },
     {NULL, NULL, 0, NULL},
 };
 
@@ -521,5 +1047,16 @@ static struct PyModuleDef wsframecoder_mod = {
 
 PyMODINIT_FUNC
 PyInit__wsframecoder(void) {
-    return PyModule_Create(&wsframecoder_mod);
+    _wsfc_masking_init();
+    _wsfc_accept_key_init();
+
+    PyObject *module = PyModule_Create(&wsframecoder_mod);
+    if (module == NULL) {
+        return NULL;
+    }
+    if (PyModule_AddStringConstant(module, "MASKING_KERNEL", _wsfc_masking_kernel_name()) == -1) {
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
 }
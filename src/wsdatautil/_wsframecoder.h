@@ -0,0 +1,42 @@
+#ifndef WSFRAMECODER_H
+#define WSFRAMECODER_H
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#if __ARM_NEON
+#include <arm_neon.h>
+#elif __SSE2__
+#include <emmintrin.h>
+#endif
+
+// the x86 kernels are compiled with per-function target attributes and selected at runtime,
+// the translation units themselves only assume the baseline of the build target
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+#define WSFC_X86_DISPATCH 1
+#include <immintrin.h>
+#include <cpuid.h>
+#endif
+
+
+// _wsframecoder_masking.c
+
+// select the masking kernel for the running CPU, called once at module initialization
+void _wsfc_masking_init(void);
+
+// the name of the kernel selected for large payloads (avx512bw, avx2, sse2, neon or swar64)
+const char * _wsfc_masking_kernel_name(void);
+
+// apply the 4 bytes `mask` to `len` bytes of `input`, `output` may be identical to `input`
+void _wsfc_masking(char *output, const char *input, Py_ssize_t len, const char *mask);
+
+
+// _wsframecoder_sha1.c
+
+// select the SHA-1 kernel for the running CPU and prepare the constant blocks, called once at module initialization
+void _wsfc_accept_key_init(void);
+
+// write the 28 characters of Sec-WebSocket-Accept for `key` to `output`, -1 with an exception set on failure
+int _wsfc_make_accept_key(const char *key, Py_ssize_t key_len, char *output);
+
+#endif
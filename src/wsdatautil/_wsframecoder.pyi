@@ -1,8 +1,20 @@
-from typing import Literal
+from typing import Any, Iterable, Literal, TypeVar
+
+
+_T = TypeVar("_T", bound=tuple[Any, ...])
+
+_Buffer = bytes | bytearray | memoryview
+
+
+MASKING_KERNEL: str
+"""
+the name of the masking implementation selected for large payloads at import
+(avx512bw, avx2, sse2, neon, swar64; numba, numpy or bigint in the pure Python fallback)
+"""
 
 
 def parse(
-        streamdata: bytes,
+        streamdata: _Buffer,
         auto_demask: bool
 ) -> tuple[int, int, int, int, int, int, int, int, bytes, bytes]:
     """
@@ -23,6 +35,33 @@ def parse(
     """
     ...
 
+def parse_frame(
+        frame_type: type[_T],
+        streamdata: _Buffer,
+        auto_demask: bool,
+        copy: bool = True,
+        /
+) -> _T:
+    """
+    parse [and decode] a WebSocket frame into a `frame_type` instance
+
+    - frame_type: a tuple subclass with the fields of ``wsdatautil.Frame``
+    - copy: if false, a payload that is not de-masked is a memoryview into `streamdata`
+
+    returns: frame_type(
+        - payload: masked/de-masked payload: bytes | memoryview,
+        - opcode: int,
+        - mask: 4 bytes | None,
+        - fin: 0|1,
+        - rsv1: 0|1,
+        - rsv2: 0|1,
+        - rsv3: 0|1,
+        - amount_spec: int,
+        - amount: int
+    )
+    """
+    ...
+
 def build(
         fin: Literal[0, 1] | int,
         rsv1: Literal[0, 1] | int,
@@ -30,7 +69,7 @@ def build(
         rsv3: Literal[0, 1] | int,
         opcode: Literal[1, 2, 8, 9, 10] | int,
         mask: bytes,
-        payload: bytes,
+        payload: _Buffer,
         /
 ) -> bytes:
     """
@@ -46,22 +85,113 @@ def build(
     """
     ...
 
+def build_frame(
+        frame: tuple[Any, ...],
+        /
+) -> bytes:
+    """
+    create a WebSocket frame from a ``wsdatautil.Frame``
+
+    - frame: (payload, opcode, mask, fin, rsv1, rsv2, rsv3, ...)
+    """
+    ...
+
+def build_into(
+        frame: tuple[Any, ...],
+        buffer: bytearray | memoryview,
+        offset: int = 0,
+        /
+) -> int:
+    """
+    write a WebSocket frame from a ``wsdatautil.Frame`` into a writable buffer at `offset`
+
+    - frame: (payload, opcode, mask, fin, rsv1, rsv2, rsv3, ...)
+    - buffer: writable bytes-like object
+    - offset: start position in the buffer
+
+    returns: the offset behind the written frame
+    """
+    ...
+
+def build_many(
+        frames: Iterable[tuple[Any, ...]],
+        /
+) -> bytes:
+    """
+    create the concatenated WebSocket frames from ``wsdatautil.Frame``'s
+
+    - frames: [(payload, opcode, mask, fin, rsv1, rsv2, rsv3, ...), ...]
+    """
+    ...
+
 def masking(
-        payload: bytes,
+        payload: _Buffer,
         mask: bytes,
         /
 ) -> bytes:
     """
     apply masking to a WebSocket payload
 
-    - payload: bytes
-    - mask: empty or 4 bytes
+    - payload: bytes-like object
+    - mask: 4 bytes
+    """
+    ...
+
+def masking_inplace(
+        buffer: bytearray | memoryview,
+        mask: bytes,
+        /
+) -> None:
+    """
+    apply masking to a writable buffer in place
+
+    - buffer: writable bytes-like object
+    - mask: 4 bytes
+    """
+    ...
+
+
+def mask_frame(
+        frame: tuple[Any, ...],
+        /
+) -> bytes:
+    """
+    apply the masking of a ``wsdatautil.Frame`` to its payload
+
+    - frame: (payload, opcode, mask, fin, rsv1, rsv2, rsv3, ...)
+    """
+    ...
+
+
+def accept_key(
+        websocket_b64key: _Buffer,
+        /
+) -> bytes:
+    """
+    create the value of Sec-WebSocket-Accept
+
+    - websocket_b64key: the value of Sec-WebSocket-Key
+    """
+    ...
+
+
+def parse_headers(
+        streamdata: _Buffer,
+        /
+) -> tuple[bytes, list[tuple[bytes, bytes]]]:
+    """
+    parse an HTTP header
+
+    returns: (
+        - first line: bytes,
+        - fields: [(key, value), ...]
+    )
     """
     ...
 
 
 def read_header(
-        two_bytes: bytes,
+        two_bytes: _Buffer,
         /
 ) -> tuple[int, int, int, int, int, int, int, int]:
     """
@@ -82,7 +212,7 @@ def read_header(
 
 
 def read_header_continuation(
-        continuation_bytes: bytes,
+        continuation_bytes: _Buffer,
         amount_spec: int,
         masked: bool,
         /
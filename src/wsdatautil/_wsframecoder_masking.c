@@ -0,0 +1,237 @@
+#include "_wsframecoder.h"
+
+
+// masking is bound by memory bandwidth, the AVX-512 kernel measured no faster than AVX2 and
+// can lower the clock of older server CPUs, build with -DWSFC_MASKING_AVX512=1 to enable it
+#ifndef WSFC_MASKING_AVX512
+#define WSFC_MASKING_AVX512 0
+#endif
+
+
+typedef void (*_masking_kernel)(char *output, const char *input, Py_ssize_t len, const char *mask);
+
+
+static void _masking_swar64(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    Py_ssize_t i = 0;
+
+    uint32_t mask_32;
+    memcpy(&mask_32, mask, 4);
+    uint64_t mask_64 = ((uint64_t)mask_32 << 32) | (uint64_t)mask_32;
+
+    // memcpy instead of pointer casts for unaligned access, compiled to plain loads and stores
+    Py_ssize_t input_len_256 = len & ~31;
+    for (; i < input_len_256; i += 32) {
+        uint64_t in_0, in_1, in_2, in_3;
+        memcpy(&in_0, input + i, 8);
+        memcpy(&in_1, input + i + 8, 8);
+        memcpy(&in_2, input + i + 16, 8);
+        memcpy(&in_3, input + i + 24, 8);
+        in_0 ^= mask_64;
+        in_1 ^= mask_64;
+        in_2 ^= mask_64;
+        in_3 ^= mask_64;
+        memcpy(output + i, &in_0, 8);
+        memcpy(output + i + 8, &in_1, 8);
+        memcpy(output + i + 16, &in_2, 8);
+        memcpy(output + i + 24, &in_3, 8);
+    }
+
+    Py_ssize_t input_len_64 = len & ~7;
+    for (; i < input_len_64; i += 8) {
+        uint64_t in_64;
+        memcpy(&in_64, input + i, 8);
+        in_64 ^= mask_64;
+        memcpy(output + i, &in_64, 8);
+    }
+
+    // i is a multiple of 8, the remaining bytes start at mask[0]
+    switch (len - i) {
+        case 7: output[i + 6] = input[i + 6] ^ mask[2];  // fall through
+        case 6: output[i + 5] = input[i + 5] ^ mask[1];  // fall through
+        case 5: output[i + 4] = input[i + 4] ^ mask[0];  // fall through
+        case 4: output[i + 3] = input[i + 3] ^ mask[3];  // fall through
+        case 3: output[i + 2] = input[i + 2] ^ mask[2];  // fall through
+        case 2: output[i + 1] = input[i + 1] ^ mask[1];  // fall through
+        case 1: output[i]     = input[i]     ^ mask[0];
+    }
+}
+
+
+static void _masking_base(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    Py_ssize_t i = 0;
+
+#if __SSE2__
+    Py_ssize_t input_len_128 = len & ~15;
+    __m128i mask_128 = _mm_set1_epi32(*(uint32_t *)mask);
+
+    for (; i < input_len_128; i += 16) {
+        __m128i in_128 = _mm_loadu_si128((__m128i *)(input + i));
+        __m128i out_128 = _mm_xor_si128(in_128, mask_128);
+        _mm_storeu_si128((__m128i *)(output + i), out_128);
+    }
+#endif
+
+    // callers only pass offsets that are multiples of 4, the mask does not need to be rotated
+    _masking_swar64(output + i, input + i, len - i, mask);
+}
+
+
+#if __ARM_NEON
+static void _masking_neon(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    Py_ssize_t i = 0;
+
+    // NEON is part of the aarch64 baseline, no runtime dispatch required
+    uint8x16_t mask_128 = vreinterpretq_u8_u32(vdupq_n_u32(*(uint32_t *)mask));
+
+    Py_ssize_t input_len_512 = len & ~63;
+    for (; i < input_len_512; i += 64) {
+        uint8x16_t in_0 = vld1q_u8((uint8_t *)(input + i));
+        uint8x16_t in_1 = vld1q_u8((uint8_t *)(input + i + 16));
+        uint8x16_t in_2 = vld1q_u8((uint8_t *)(input + i + 32));
+        uint8x16_t in_3 = vld1q_u8((uint8_t *)(input + i + 48));
+        vst1q_u8((uint8_t *)(output + i), veorq_u8(in_0, mask_128));
+        vst1q_u8((uint8_t *)(output + i + 16), veorq_u8(in_1, mask_128));
+        vst1q_u8((uint8_t *)(output + i + 32), veorq_u8(in_2, mask_128));
+        vst1q_u8((uint8_t *)(output + i + 48), veorq_u8(in_3, mask_128));
+    }
+
+    Py_ssize_t input_len_128 = len & ~15;
+    for (; i < input_len_128; i += 16) {
+        uint8x16_t in_128 = vld1q_u8((uint8_t *)(input + i));
+        vst1q_u8((uint8_t *)(output + i), veorq_u8(in_128, mask_128));
+    }
+
+    _masking_swar64(output + i, input + i, len - i, mask);
+}
+#endif
+
+
+#if WSFC_X86_DISPATCH
+__attribute__((target("avx2")))
+static void _masking_avx2(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    Py_ssize_t i = 0;
+
+    // the mask repeats every 4 bytes, so each 32-byte lane starts aligned to it
+    __m256i mask_256 = _mm256_set1_epi32(*(uint32_t *)mask);
+
+    Py_ssize_t input_len_1024 = len & ~127;
+    for (; i < input_len_1024; i += 128) {
+        __m256i in_0 = _mm256_loadu_si256((__m256i *)(input + i));
+        __m256i in_1 = _mm256_loadu_si256((__m256i *)(input + i + 32));
+        __m256i in_2 = _mm256_loadu_si256((__m256i *)(input + i + 64));
+        __m256i in_3 = _mm256_loadu_si256((__m256i *)(input + i + 96));
+        _mm256_storeu_si256((__m256i *)(output + i), _mm256_xor_si256(in_0, mask_256));
+        _mm256_storeu_si256((__m256i *)(output + i + 32), _mm256_xor_si256(in_1, mask_256));
+        _mm256_storeu_si256((__m256i *)(output + i + 64), _mm256_xor_si256(in_2, mask_256));
+        _mm256_storeu_si256((__m256i *)(output + i + 96), _mm256_xor_si256(in_3, mask_256));
+    }
+
+    Py_ssize_t input_len_256 = len & ~31;
+    for (; i < input_len_256; i += 32) {
+        __m256i in_256 = _mm256_loadu_si256((__m256i *)(input + i));
+        _mm256_storeu_si256((__m256i *)(output + i), _mm256_xor_si256(in_256, mask_256));
+    }
+
+    _mm256_zeroupper();
+
+    // i is a multiple of 4, the mask does not need to be rotated for the tail
+    _masking_base(output + i, input + i, len - i, mask);
+}
+#endif
+
+
+#if WSFC_X86_DISPATCH && WSFC_MASKING_AVX512
+__attribute__((target("avx512f,avx512bw")))
+static void _masking_avx512(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    Py_ssize_t i = 0;
+
+    __m512i mask_512 = _mm512_set1_epi32(*(uint32_t *)mask);
+
+    Py_ssize_t input_len_2048 = len & ~255;
+    for (; i < input_len_2048; i += 256) {
+        __m512i in_0 = _mm512_loadu_si512((void *)(input + i));
+        __m512i in_1 = _mm512_loadu_si512((void *)(input + i + 64));
+        __m512i in_2 = _mm512_loadu_si512((void *)(input + i + 128));
+        __m512i in_3 = _mm512_loadu_si512((void *)(input + i + 192));
+        _mm512_storeu_si512((void *)(output + i), _mm512_xor_si512(in_0, mask_512));
+        _mm512_storeu_si512((void *)(output + i + 64), _mm512_xor_si512(in_1, mask_512));
+        _mm512_storeu_si512((void *)(output + i + 128), _mm512_xor_si512(in_2, mask_512));
+        _mm512_storeu_si512((void *)(output + i + 192), _mm512_xor_si512(in_3, mask_512));
+    }
+
+    Py_ssize_t input_len_512 = len & ~63;
+    for (; i < input_len_512; i += 64) {
+        __m512i in_512 = _mm512_loadu_si512((void *)(input + i));
+        _mm512_storeu_si512((void *)(output + i), _mm512_xor_si512(in_512, mask_512));
+    }
+
+    // byte granular masked load and store for the tail (AVX-512BW), faults beyond `len` are suppressed
+    if (i < len) {
+        __mmask64 tail = ((__mmask64)1 << (len - i)) - 1;
+        __m512i in_512 = _mm512_maskz_loadu_epi8(tail, input + i);
+        _mm512_mask_storeu_epi8(output + i, tail, _mm512_xor_si512(in_512, mask_512));
+    }
+
+    _mm256_zeroupper();
+}
+#endif
+
+
+#if __ARM_NEON
+#define _masking_narrow _masking_neon
+#define _MASKING_NARROW_NAME "neon"
+#elif __SSE2__
+#define _masking_narrow _masking_base
+#define _MASKING_NARROW_NAME "sse2"
+#else
+#define _masking_narrow _masking_base
+#define _MASKING_NARROW_NAME "swar64"
+#endif
+
+
+// selected once at module initialization
+static _masking_kernel _masking_impl = _masking_narrow;
+static const char *_masking_impl_name = _MASKING_NARROW_NAME;
+
+
+// below these payload lengths the setup of the wider kernels does not pay off
+#ifndef WSFC_MASKING_NARROW_THRESHOLD
+#define WSFC_MASKING_NARROW_THRESHOLD 64
+#endif
+#ifndef WSFC_MASKING_WIDE_THRESHOLD
+#define WSFC_MASKING_WIDE_THRESHOLD 512
+#endif
+
+
+void _wsfc_masking(char *output, const char *input, Py_ssize_t len, const char *mask) {
+    if (len < WSFC_MASKING_NARROW_THRESHOLD) {
+        _masking_swar64(output, input, len, mask);
+    } else if (len < WSFC_MASKING_WIDE_THRESHOLD) {
+        _masking_narrow(output, input, len, mask);
+    } else {
+        _masking_impl(output, input, len, mask);
+    }
+}
+
+
+void _wsfc_masking_init(void) {
+#if WSFC_X86_DISPATCH
+    __builtin_cpu_init();
+#if WSFC_MASKING_AVX512
+    if (__builtin_cpu_supports("avx512f") && __builtin_cpu_supports("avx512bw")) {
+        _masking_impl = _masking_avx512;
+        _masking_impl_name = "avx512bw";
+        return;
+    }
+#endif
+    if (__builtin_cpu_supports("avx2")) {
+        _masking_impl = _masking_avx2;
+        _masking_impl_name = "avx2";
+    }
+#endif
+}
+
+
+const char * _wsfc_masking_kernel_name(void) {
+    return _masking_impl_name;
+}
@@ -0,0 +1,400 @@
+#include "_wsframecoder.h"
+
+
+typedef void (*_sha1_kernel)(uint32_t *state, const unsigned char *data, Py_ssize_t blocks);
+
+
+#define _ROL32(x, n) (((x) << (n)) | ((x) >> (32 - (n))))
+
+
+static void _sha1_schedule(uint32_t *w) {
+    for (int t = 16; t < 80; t++) {
+        w[t] = _ROL32(w[t - 3] ^ w[t - 8] ^ w[t - 14] ^ w[t - 16], 1);
+    }
+}
+
+
+static void _sha1_rounds(uint32_t *state, const uint32_t *w) {
+    uint32_t a = state[0];
+    uint32_t b = state[1];
+    uint32_t c = state[2];
+    uint32_t d = state[3];
+    uint32_t e = state[4];
+
+    for (int t = 0; t < 80; t++) {
+        uint32_t f, k;
+        if (t < 20) {
+            f = (b & c) | (~b & d);
+            k = 0x5A827999;
+        } else if (t < 40) {
+            f = b ^ c ^ d;
+            k = 0x6ED9EBA1;
+        } else if (t < 60) {
+            f = (b & c) | (b & d) | (c & d);
+            k = 0x8F1BBCDC;
+        } else {
+            f = b ^ c ^ d;
+            k = 0xCA62C1D6;
+        }
+        uint32_t temp = _ROL32(a, 5) + f + e + k + w[t];
+        e = d;
+        d = c;
+        c = _ROL32(b, 30);
+        b = a;
+        a = temp;
+    }
+
+    state[0] += a;
+    state[1] += b;
+    state[2] += c;
+    state[3] += d;
+    state[4] += e;
+}
+
+
+static void _sha1_base(uint32_t *state, const unsigned char *data, Py_ssize_t blocks) {
+    uint32_t w[80];
+
+    for (; blocks > 0; blocks--, data += 64) {
+        for (int t = 0; t < 16; t++) {
+            w[t] = ((uint32_t)data[t * 4] << 24)
+                 | ((uint32_t)data[t * 4 + 1] << 16)
+                 | ((uint32_t)data[t * 4 + 2] << 8)
+                 |  (uint32_t)data[t * 4 + 3];
+        }
+        _sha1_schedule(w);
+        _sha1_rounds(state, w);
+    }
+}
+
+
+#if WSFC_X86_DISPATCH
+// follows the Intel SHA extensions reference implementation
+__attribute__((target("sha,sse4.1")))
+static void _sha1_shani(uint32_t *state, const unsigned char *data, Py_ssize_t blocks) {
+    __m128i abcd, abcd_save, e0, e0_save, e1;
+    __m128i msg_0, msg_1, msg_2, msg_3;
+    const __m128i shuffle_mask = _mm_set_epi64x(0x0001020304050607ULL, 0x08090a0b0c0d0e0fULL);
+
+    abcd = _mm_shuffle_epi32(_mm_loadu_si128((const __m128i *)state), 0x1B);
+    e0 = _mm_set_epi32(state[4], 0, 0, 0);
+
+    for (; blocks > 0; blocks--, data += 64) {
+        abcd_save = abcd;
+        e0_save = e0;
+
+        // rounds 0-3
+        msg_0 = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(data + 0)), shuffle_mask);
+        e0 = _mm_add_epi32(e0, msg_0);
+        e1 = abcd;
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 0);
+
+        // rounds 4-7
+        msg_1 = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(data + 16)), shuffle_mask);
+        e1 = _mm_sha1nexte_epu32(e1, msg_1);
+        e0 = abcd;
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 0);
+        msg_0 = _mm_sha1msg1_epu32(msg_0, msg_1);
+
+        // rounds 8-11
+        msg_2 = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(data + 32)), shuffle_mask);
+        e0 = _mm_sha1nexte_epu32(e0, msg_2);
+        e1 = abcd;
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 0);
+        msg_1 = _mm_sha1msg1_epu32(msg_1, msg_2);
+        msg_0 = _mm_xor_si128(msg_0, msg_2);
+
+        // rounds 12-15
+        msg_3 = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(data + 48)), shuffle_mask);
+        e1 = _mm_sha1nexte_epu32(e1, msg_3);
+        e0 = abcd;
+        msg_0 = _mm_sha1msg2_epu32(msg_0, msg_3);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 0);
+        msg_2 = _mm_sha1msg1_epu32(msg_2, msg_3);
+        msg_1 = _mm_xor_si128(msg_1, msg_3);
+
+        // rounds 16-19
+        e0 = _mm_sha1nexte_epu32(e0, msg_0);
+        e1 = abcd;
+        msg_1 = _mm_sha1msg2_epu32(msg_1, msg_0);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 0);
+        msg_3 = _mm_sha1msg1_epu32(msg_3, msg_0);
+        msg_2 = _mm_xor_si128(msg_2, msg_0);
+
+        // rounds 20-23
+        e1 = _mm_sha1nexte_epu32(e1, msg_1);
+        e0 = abcd;
+        msg_2 = _mm_sha1msg2_epu32(msg_2, msg_1);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 1);
+        msg_0 = _mm_sha1msg1_epu32(msg_0, msg_1);
+        msg_3 = _mm_xor_si128(msg_3, msg_1);
+
+        // rounds 24-27
+        e0 = _mm_sha1nexte_epu32(e0, msg_2);
+        e1 = abcd;
+        msg_3 = _mm_sha1msg2_epu32(msg_3, msg_2);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 1);
+        msg_1 = _mm_sha1msg1_epu32(msg_1, msg_2);
+        msg_0 = _mm_xor_si128(msg_0, msg_2);
+
+        // rounds 28-31
+        e1 = _mm_sha1nexte_epu32(e1, msg_3);
+        e0 = abcd;
+        msg_0 = _mm_sha1msg2_epu32(msg_0, msg_3);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 1);
+        msg_2 = _mm_sha1msg1_epu32(msg_2, msg_3);
+        msg_1 = _mm_xor_si128(msg_1, msg_3);
+
+        // rounds 32-35
+        e0 = _mm_sha1nexte_epu32(e0, msg_0);
+        e1 = abcd;
+        msg_1 = _mm_sha1msg2_epu32(msg_1, msg_0);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 1);
+        msg_3 = _mm_sha1msg1_epu32(msg_3, msg_0);
+        msg_2 = _mm_xor_si128(msg_2, msg_0);
+
+        // rounds 36-39
+        e1 = _mm_sha1nexte_epu32(e1, msg_1);
+        e0 = abcd;
+        msg_2 = _mm_sha1msg2_epu32(msg_2, msg_1);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 1);
+        msg_0 = _mm_sha1msg1_epu32(msg_0, msg_1);
+        msg_3 = _mm_xor_si128(msg_3, msg_1);
+
+        // rounds 40-43
+        e0 = _mm_sha1nexte_epu32(e0, msg_2);
+        e1 = abcd;
+        msg_3 = _mm_sha1msg2_epu32(msg_3, msg_2);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 2);
+        msg_1 = _mm_sha1msg1_epu32(msg_1, msg_2);
+        msg_0 = _mm_xor_si128(msg_0, msg_2);
+
+        // rounds 44-47
+        e1 = _mm_sha1nexte_epu32(e1, msg_3);
+        e0 = abcd;
+        msg_0 = _mm_sha1msg2_epu32(msg_0, msg_3);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 2);
+        msg_2 = _mm_sha1msg1_epu32(msg_2, msg_3);
+        msg_1 = _mm_xor_si128(msg_1, msg_3);
+
+        // rounds 48-51
+        e0 = _mm_sha1nexte_epu32(e0, msg_0);
+        e1 = abcd;
+        msg_1 = _mm_sha1msg2_epu32(msg_1, msg_0);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 2);
+        msg_3 = _mm_sha1msg1_epu32(msg_3, msg_0);
+        msg_2 = _mm_xor_si128(msg_2, msg_0);
+
+        // rounds 52-55
+        e1 = _mm_sha1nexte_epu32(e1, msg_1);
+        e0 = abcd;
+        msg_2 = _mm_sha1msg2_epu32(msg_2, msg_1);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 2);
+        msg_0 = _mm_sha1msg1_epu32(msg_0, msg_1);
+        msg_3 = _mm_xor_si128(msg_3, msg_1);
+
+        // rounds 56-59
+        e0 = _mm_sha1nexte_epu32(e0, msg_2);
+        e1 = abcd;
+        msg_3 = _mm_sha1msg2_epu32(msg_3, msg_2);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 2);
+        msg_1 = _mm_sha1msg1_epu32(msg_1, msg_2);
+        msg_0 = _mm_xor_si128(msg_0, msg_2);
+
+        // rounds 60-63
+        e1 = _mm_sha1nexte_epu32(e1, msg_3);
+        e0 = abcd;
+        msg_0 = _mm_sha1msg2_epu32(msg_0, msg_3);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 3);
+        msg_2 = _mm_sha1msg1_epu32(msg_2, msg_3);
+        msg_1 = _mm_xor_si128(msg_1, msg_3);
+
+        // rounds 64-67
+        e0 = _mm_sha1nexte_epu32(e0, msg_0);
+        e1 = abcd;
+        msg_1 = _mm_sha1msg2_epu32(msg_1, msg_0);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 3);
+        msg_3 = _mm_sha1msg1_epu32(msg_3, msg_0);
+        msg_2 = _mm_xor_si128(msg_2, msg_0);
+
+        // rounds 68-71
+        e1 = _mm_sha1nexte_epu32(e1, msg_1);
+        e0 = abcd;
+        msg_2 = _mm_sha1msg2_epu32(msg_2, msg_1);
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 3);
+        msg_3 = _mm_xor_si128(msg_3, msg_1);
+
+        // rounds 72-75
+        e0 = _mm_sha1nexte_epu32(e0, msg_2);
+        e1 = abcd;
+        msg_3 = _mm_sha1msg2_epu32(msg_3, msg_2);
+        abcd = _mm_sha1rnds4_epu32(abcd, e0, 3);
+
+        // rounds 76-79
+        e1 = _mm_sha1nexte_epu32(e1, msg_3);
+        e0 = abcd;
+        abcd = _mm_sha1rnds4_epu32(abcd, e1, 3);
+
+        e0 = _mm_sha1nexte_epu32(e0, e0_save);
+        abcd = _mm_add_epi32(abcd, abcd_save);
+    }
+
+    _mm_storeu_si128((__m128i *)state, _mm_shuffle_epi32(abcd, 0x1B));
+    state[4] = _mm_extract_epi32(e0, 3);
+}
+
+
+static int _cpu_has_shani(void) {
+    unsigned int eax, ebx, ecx, edx;
+
+    // SSSE3 and SSE4.1 are required for the byte shuffle and the extraction of E
+    if (!__get_cpuid(1, &eax, &ebx, &ecx, &edx)) {
+        return 0;
+    }
+    if (!(ecx & (1 << 9)) || !(ecx & (1 << 19))) {
+        return 0;
+    }
+    // CPUID.07H:EBX.SHA[bit 29]
+    if (!__get_cpuid_count(7, 0, &eax, &ebx, &ecx, &edx)) {
+        return 0;
+    }
+    return (ebx >> 29) & 1;
+}
+#endif
+
+
+// selected once at module initialization
+static _sha1_kernel _sha1_impl = _sha1_base;
+
+
+static const char _b64_alphabet[] = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+
+static const char _accept_key_guid[] = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11";
+
+
+// The Sec-WebSocket-Key is usually the base64 string of a 16 bytes nonce (24 characters).
+// The key and the GUID then fill up the first block exactly and the second block only
+// contains the padding and the message length, which is the same for every handshake.
+static unsigned char _accept_key_24_blocks[128];
+
+static const uint32_t _accept_key_24_tail_words[16] = {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 60 << 3};
+
+static uint32_t _accept_key_24_tail_schedule[80];
+
+
+typedef void (*_accept_key_24_kernel)(uint32_t *state, const unsigned char *blocks);
+
+
+static void _accept_key_24_base(uint32_t *state, const unsigned char *blocks) {
+    _sha1_base(state, blocks, 1);
+    _sha1_rounds(state, _accept_key_24_tail_schedule);
+}
+
+
+#if WSFC_X86_DISPATCH
+static void _accept_key_24_shani(uint32_t *state, const unsigned char *blocks) {
+    _sha1_shani(state, blocks, 2);
+}
+#endif
+
+
+// selected once at module initialization
+static _accept_key_24_kernel _accept_key_24_impl = _accept_key_24_base;
+
+
+void _wsfc_accept_key_init(void) {
+    memset(_accept_key_24_blocks, 0, 128);
+    memcpy(_accept_key_24_blocks + 24, _accept_key_guid, 36);
+    _accept_key_24_blocks[60] = 0x80;
+    _accept_key_24_blocks[126] = ((60 << 3) >> 8) & 0b11111111;
+    _accept_key_24_blocks[127] =  (60 << 3)       & 0b11111111;
+
+    memcpy(_accept_key_24_tail_schedule, _accept_key_24_tail_words, sizeof(_accept_key_24_tail_words));
+    _sha1_schedule(_accept_key_24_tail_schedule);
+
+#if WSFC_X86_DISPATCH
+    if (_cpu_has_shani()) {
+        _sha1_impl = _sha1_shani;
+        _accept_key_24_impl = _accept_key_24_shani;
+    }
+#endif
+}
+
+
+static int _accept_key_sha1(const char *key, Py_ssize_t key_len, uint32_t *state) {
+    unsigned char  stack_buffer[128];
+    unsigned char *buffer = stack_buffer;
+
+    if (key_len == 24) {
+        memcpy(buffer, _accept_key_24_blocks, 128);
+        memcpy(buffer, key, 24);
+        _accept_key_24_impl(state, buffer);
+        return 0;
+    }
+
+    Py_ssize_t data_len = key_len + 36;
+    Py_ssize_t blocks = (data_len + 8) / 64 + 1;
+
+    if (blocks * 64 > (Py_ssize_t)sizeof(stack_buffer)) {
+        buffer = (unsigned char*)malloc(blocks * 64);
+        if (buffer == NULL) {
+            PyErr_Format(
+                PyExc_SystemError,
+                "Memory allocation failed"
+            );
+            return -1;
+        };
+    }
+
+    memcpy(buffer, key, key_len);
+    memcpy(buffer + key_len, _accept_key_guid, 36);
+    buffer[data_len] = 0x80;
+    memset(buffer + data_len + 1, 0, blocks * 64 - data_len - 1);
+
+    uint64_t bit_len = (uint64_t)data_len << 3;
+    for (int i = 0; i < 8; i++) {
+        buffer[blocks * 64 - 1 - i] = (bit_len >> (i * 8)) & 0b11111111;
+    }
+
+    _sha1_impl(state, buffer, blocks);
+
+    if (buffer != stack_buffer) {
+        free(buffer);
+    }
+    return 0;
+}
+
+
+#define _B64_GROUP(output, group)                                   \
+    do {                                                            \
+        (output)[0] = _b64_alphabet[((group) >> 18) & 0b111111];    \
+        (output)[1] = _b64_alphabet[((group) >> 12) & 0b111111];    \
+        (output)[2] = _b64_alphabet[((group) >> 6)  & 0b111111];    \
+        (output)[3] = _b64_alphabet[ (group)        & 0b111111];    \
+    } while (0)
+
+
+// the 20 bytes digest is always encoded to 27 characters and one padding character,
+// the groups of 3 bytes are taken directly from the big-endian state words
+static void _b64_encode_digest(const uint32_t *state, char *output) {
+    _B64_GROUP(output,        state[0] >> 8);
+    _B64_GROUP(output + 4,  ((state[0] & 0x000000FF) << 16) | (state[1] >> 16));
+    _B64_GROUP(output + 8,  ((state[1] & 0x0000FFFF) << 8)  | (state[2] >> 24));
+    _B64_GROUP(output + 12,   state[2] & 0x00FFFFFF);
+    _B64_GROUP(output + 16,   state[3] >> 8);
+    _B64_GROUP(output + 20, ((state[3] & 0x000000FF) << 16) | (state[4] >> 16));
+    _B64_GROUP(output + 24,  (state[4] & 0x0000FFFF) << 8);
+    output[27] = '=';
+}
+
+
+int _wsfc_make_accept_key(const char *key, Py_ssize_t key_len, char *output) {
+    uint32_t state[5] = {0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0};
+
+    if (_accept_key_sha1(key, key_len, state) == -1) {
+        return -1;
+    }
+
+    _b64_encode_digest(state, output);
+    return 0;
+}
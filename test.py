@@ -1,20 +1,91 @@
+import asyncio
 import pprint
-import socket
-import threading
 import unittest
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from base64 import b64encode, b64decode
+from hashlib import sha1, blake2b
 from pathlib import Path
+from struct import Struct
 from sys import argv
 from time import perf_counter_ns
 
-from wsdatautil import _wsframecoder
-from wsdatautil import Frame, OPCODES, CLOSECODES, StreamReader
+from wsdatautil import _wsframecoder, _pywsframecoder
+from wsdatautil import Frame, OPCODES, CLOSECODES, StreamReader, FrameFactory
 from wsdatautil import get_close_code_and_message_from_frame
 from wsdatautil import HandshakeRequest
 
 
+# Stream data of known frames and their expected fields, built once at import
+_CONSTANT_BYTE_CASES = [
+    # Small payload, no masking, TEXT frame, fin set, no RSV bits
+    {
+        "name": "small_unmasked_text",
+        "bytes": b'\x81\x0dHello, World!',
+        "expected": {
+            "opcode": OPCODES.TEXT,
+            "fin": 1,
+            "rsv1": 0,
+            "rsv2": 0,
+            "rsv3": 0,
+            "payload": b'Hello, World!',
+            "masked": False
+        }
+    },
+    # Small payload, masked, BINARY frame, fin unset, RSV1 set
+    {
+        "name": "small_masked_binary_rsv1",
+        "bytes": b'\x42\x8c\x01\x02\x03\x04\x49\x67\x6f\x68\x6e\x2e\x23\x56\x52\x54\x32\x25',
+        "expected": {
+            "opcode": OPCODES.BINARY,
+            "fin": 0,
+            "rsv1": 1,
+            "rsv2": 0,
+            "rsv3": 0,
+            "payload": b'Hello, RSV1!',
+            "masked": True
+        }
+    },
+    # Extended 16-bit length, unmasked, PING frame
+    {
+        "name": "extended_16_unmasked_ping",
+        "bytes": b'\x89\x7e\x00\x7e' + (pl := b'a' * 126),
+        "expected": {
+            "opcode": OPCODES.PING,
+            "fin": 1,
+            "rsv1": 0,
+            "rsv2": 0,
+            "rsv3": 0,
+            "payload": pl,
+            "masked": False
+        }
+    },
+    # Extended 64-bit length, masked, PONG frame, all RSV bits set
+    {
+        "name": "extended_64_masked_pong_all_rsv",
+        "bytes": b'\xfA\xfe\x01\x10' + b'\x01\x02\x00\x04' + (b'\x00\x55\xff\x04' * (272 // 4)),
+        "expected": {
+            "opcode": OPCODES.PONG,
+            "fin": 1,
+            "rsv1": 1,
+            "rsv2": 1,
+            "rsv3": 1,
+            "payload": (b'\x01\x57\xff\x00' * (272 // 4)),
+            "masked": True
+        }
+    }
+]
+
+
 class TestWebSocketFrame(unittest.TestCase):
 
+    def _eq_bytes(self, first, second):
+        # compare large payloads by digest, a failure would otherwise render a diff of both
+        if len(first) >= 4096 or len(second) >= 4096:
+            self.assertEqual(blake2b(first, digest_size=16).digest(), blake2b(second, digest_size=16).digest())
+        else:
+            self.assertEqual(first, second)
+
     def test_frame_creation(self):
         # Basic test for frame creation with default settings
         payload = b'Hello, WebSocket!'
@@ -52,55 +123,82 @@ class TestWebSocketFrame(unittest.TestCase):
             {"fin": 1, "rsv1": 1, "rsv2": 1, "rsv3": 1}  # All RSV flags set
         ]
 
-        # Test each combination of payload length, masking, opcode, and flags
-        for length_type, payload in payloads.items():
-            for masked in [True, False]:
-                for opcode in opcodes:
-                    for flag_combination in flags:
-                        with self.subTest(length_type=length_type, masked=masked, opcode=opcode, flags=flag_combination):
-                            # Create the frame with given parameters
-                            frame = Frame(
-                                payload=payload,
-                                opcode=opcode,
-                                fin=flag_combination["fin"],
-                                rsv1=flag_combination["rsv1"],
-                                rsv2=flag_combination["rsv2"],
-                                rsv3=flag_combination["rsv3"],
-                                mask=b'\x01\x02\x03\x04' if masked else None
-                            )
-
-                            # Convert to byte stream
-                            stream_data = frame.to_streamdata()
-
-                            # Parse back the frame from byte stream
-                            parsed_frame = Frame.from_streamdata(stream_data)
-
-                            # Assertions to validate frame properties
-                            self.assertEqual(parsed_frame.payload, payload)
-                            self.assertEqual(parsed_frame.opcode, opcode)
-                            self.assertEqual(parsed_frame.fin, flag_combination["fin"])
-                            self.assertEqual(parsed_frame.rsv1, flag_combination["rsv1"])
-                            self.assertEqual(parsed_frame.rsv2, flag_combination["rsv2"])
-                            self.assertEqual(parsed_frame.rsv3, flag_combination["rsv3"])
-
-                            # Verify length specifications based on payload length
-                            if length_type == "small":
-                                self.assertLessEqual(len(payload), 125)
-                                self.assertEqual(parsed_frame.amount_spec, len(payload))
-                            elif length_type == "extended_16":
-                                self.assertGreater(len(payload), 125)
-                                self.assertLessEqual(len(payload), 65535)
-                                self.assertEqual(parsed_frame.amount_spec, 126)
-                            elif length_type == "extended_64":
-                                self.assertGreater(len(payload), 65535)
-                                self.assertEqual(parsed_frame.amount_spec, 127)
-
-                            # Check mask if it was set
-                            if masked:
-                                self.assertIsNotNone(parsed_frame.mask)
-                                self.assertEqual(len(parsed_frame.mask), 4)
-                            else:
-                                self.assertIsNone(parsed_frame.mask)
+        def _encode(length_type, masked, opcode):
+            # Create the frame with given parameters and convert it to a byte stream
+            return Frame(
+                payload=payloads[length_type],
+                opcode=opcode,
+                fin=1,
+                mask=b'\x01\x02\x03\x04' if masked else None
+            ).to_streamdata()
+
+        # The flags only change the first byte, so each payload, masking and opcode is encoded once
+        encoded = {
+            (length_type, masked, opcode): _encode(length_type, masked, opcode)
+            for length_type in payloads
+            for masked in [True, False]
+            for opcode in opcodes
+        }
+
+        # Each combination of payload length, masking, opcode, and flags
+        cases = [
+            (length_type, masked, opcode, flag_combination)
+            for length_type in payloads
+            for masked in [True, False]
+            for opcode in opcodes
+            for flag_combination in flags
+        ]
+
+        def _run_case(length_type, masked, opcode, flag_combination):
+            # Patch the flags into the first byte of the encoded frame
+            stream_data = bytearray(encoded[length_type, masked, opcode])
+            stream_data[0] = (
+                flag_combination["fin"] << 7
+                | flag_combination["rsv1"] << 6
+                | flag_combination["rsv2"] << 5
+                | flag_combination["rsv3"] << 4
+                | opcode
+            )
+
+            # Parse back the frame from byte stream
+            return Frame.from_streamdata(stream_data)
+
+        # Encode and parse in parallel (the C implementation releases the GIL for large payloads),
+        # the assertions are made in the test thread
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(_run_case, *case) for case in cases]
+
+        for (length_type, masked, opcode, flag_combination), future in zip(cases, futures):
+            payload = payloads[length_type]
+            with self.subTest(length_type=length_type, masked=masked, opcode=opcode, flags=flag_combination):
+                parsed_frame = future.result()
+
+                # Assertions to validate frame properties
+                self._eq_bytes(parsed_frame.payload, payload)
+                self.assertEqual(parsed_frame.opcode, opcode)
+                self.assertEqual(parsed_frame.fin, flag_combination["fin"])
+                self.assertEqual(parsed_frame.rsv1, flag_combination["rsv1"])
+                self.assertEqual(parsed_frame.rsv2, flag_combination["rsv2"])
+                self.assertEqual(parsed_frame.rsv3, flag_combination["rsv3"])
+
+                # Verify length specifications based on payload length
+                if length_type == "small":
+                    self.assertLessEqual(len(payload), 125)
+                    self.assertEqual(parsed_frame.amount_spec, len(payload))
+                elif length_type == "extended_16":
+                    self.assertGreater(len(payload), 125)
+                    self.assertLessEqual(len(payload), 65535)
+                    self.assertEqual(parsed_frame.amount_spec, 126)
+                elif length_type == "extended_64":
+                    self.assertGreater(len(payload), 65535)
+                    self.assertEqual(parsed_frame.amount_spec, 127)
+
+                # Check mask if it was set
+                if masked:
+                    self.assertIsNotNone(parsed_frame.mask)
+                    self.assertEqual(len(parsed_frame.mask), 4)
+                else:
+                    self.assertIsNone(parsed_frame.mask)
 
     def test_close_code_parsing(self):
         # Test parsing of close code and optional close reason
@@ -114,6 +212,110 @@ class TestWebSocketFrame(unittest.TestCase):
         self.assertEqual(code, close_code)
         self.assertEqual(extracted_reason, reason)
 
+    def test_accept_key(self):
+        # Example from RFC6455 section 1.3
+        request = HandshakeRequest(websocket_b64key=b'dGhlIHNhbXBsZSBub25jZQ==')
+        response = request.make_response()
+        self.assertEqual(response[b"Sec-WebSocket-Accept"], b's3pPLMBiTxaQ9kYGzzhZRbK+xOo=')
+
+        for key_length in (0, 16, 24, 27, 28, 92, 200):
+            with self.subTest(key_length=key_length):
+                key = b'k' * key_length
+                expected = b64encode(sha1(key + b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11").digest())
+                self.assertEqual(_wsframecoder.accept_key(key), expected)
+                # any bytes-like key, like the pure Python fallback
+                self.assertEqual(_wsframecoder.accept_key(bytearray(key)), expected)
+                self.assertEqual(_wsframecoder.accept_key(memoryview(key)), expected)
+                self.assertEqual(_pywsframecoder.accept_key(bytearray(key)), expected)
+                self.assertEqual(_pywsframecoder.accept_key(memoryview(key)), expected)
+
+    def test_header_streamdata(self):
+        request = HandshakeRequest(websocket_b64key=b'dGhlIHNhbXBsZSBub25jZQ==', resource=b'/chat')
+        stream_data = request.to_streamdata()
+        self.assertEqual(
+            stream_data,
+            b'GET /chat HTTP/1.1\r\n'
+            b'Connection: Upgrade\r\n'
+            b'Upgrade: websocket\r\n'
+            b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n'
+            b'Sec-WebSocket-Version: 13\r\n'
+            b'\r\n'
+        )
+
+        parsed_request = HandshakeRequest.from_streamdata(stream_data)
+        self.assertEqual(parsed_request.l1, request.l1)
+        self.assertEqual(list(parsed_request.items()), list(request.items()))
+
+        self.assertEqual(
+            HandshakeRequest.to_streamdata_fast(b'dGhlIHNhbXBsZSBub25jZQ==', resource=b'/chat'),
+            stream_data
+        )
+        self.assertEqual(
+            HandshakeRequest.to_streamdata_fast(b'dGhlIHNhbXBsZSBub25jZQ==', websocket_protocols=b'chat'),
+            HandshakeRequest(websocket_b64key=b'dGhlIHNhbXBsZSBub25jZQ==', websocket_protocols=b'chat').to_streamdata()
+        )
+
+    def test_control_frames(self):
+        self.assertEqual(FrameFactory.PingFrameBytes(), b'\x89\x00')
+        self.assertEqual(FrameFactory.PongFrameBytes(), b'\x8a\x00')
+        self.assertEqual(FrameFactory.PingFrame().to_streamdata(), FrameFactory.PingFrameBytes())
+        self.assertEqual(FrameFactory.PongFrame().to_streamdata(), FrameFactory.PongFrameBytes())
+        self.assertEqual(
+            FrameFactory.CloseFrame(CLOSECODES.NORMAL_CLOSURE),
+            Frame(b'\x03\xe8', OPCODES.CLOSE)
+        )
+        self.assertEqual(
+            FrameFactory.CloseFrame(CLOSECODES.GOING_AWAY, b'bye'),
+            Frame(b'\x03\xe9bye', OPCODES.CLOSE)
+        )
+
+    def test_handshake_default_key(self):
+        key_1 = HandshakeRequest()[b"Sec-WebSocket-Key"]
+        key_2 = HandshakeRequest()[b"Sec-WebSocket-Key"]
+        self.assertNotEqual(key_1, key_2)
+        self.assertEqual(len(b64decode(key_1)), 16)
+
+    def test_data_frames(self):
+        for factory, opcode in ((FrameFactory.TextDataFrame, OPCODES.TEXT), (FrameFactory.BinaryDataFrame, OPCODES.BINARY)):
+            with self.subTest(opcode=opcode):
+                self.assertEqual(factory(b'msg'), Frame(b'msg', opcode, None, 1))
+                self.assertEqual(factory(b'msg', b'1234', "first"), Frame(b'msg', opcode, b'1234', 0))
+                self.assertEqual(factory(b'msg', fragment="continue"), Frame(b'msg', OPCODES.CONTINUE, None, 0))
+                self.assertEqual(factory(b'msg', fragment="final"), Frame(b'msg', OPCODES.CONTINUE, None, 1))
+
+    def test_stream_many(self):
+        frames = [
+            Frame(b'', OPCODES.PING),
+            Frame(b'x' * 126, OPCODES.BINARY, b'1234'),
+            Frame(b'y' * 70000, OPCODES.TEXT, None, 0, 1),
+            Frame(bytearray(b'z' * 10), OPCODES.CONTINUE, b'abcd'),
+        ]
+        self.assertEqual(Frame.stream_many(frames), b"".join(frame.to_streamdata() for frame in frames))
+        self.assertEqual(Frame.stream_many(iter(frames)), Frame.stream_many(frames))
+        self.assertEqual(Frame.stream_many([]), b'')
+        with self.assertRaises(ValueError):
+            Frame.stream_many([frames[0], Frame(b'', OPCODES.PING, b'12')])
+        with self.assertRaises(TypeError):
+            Frame.stream_many([frames[0], b''])
+
+    def test_write_streamdata(self):
+        frames = [
+            Frame(b'x' * 126, OPCODES.BINARY, b'1234'),
+            Frame(b'y' * 10, OPCODES.TEXT, None, 0, 1),
+        ]
+        stream_data = Frame.stream_many(frames)
+        buffer = bytearray(len(stream_data) + 3)
+        offset = 3
+        for frame in frames:
+            offset = frame.write_streamdata(buffer, offset)
+        self.assertEqual(offset, len(buffer))
+        self.assertEqual(buffer[3:], stream_data)
+        self.assertEqual(Frame.from_streamdata(memoryview(buffer)[3:3 + 2 + 2 + 4 + 126]).payload, frames[0].payload)
+        with self.assertRaises(ValueError):
+            frames[0].write_streamdata(buffer, len(buffer) - 10)
+        with self.assertRaises(TypeError):
+            frames[0].write_streamdata(bytes(buffer))
+
     def test_to_streamdata(self):
         payload = b'Hello, WebSocket!'
         frame = Frame(payload=payload, opcode=OPCODES.TEXT, fin=1)
@@ -122,6 +324,10 @@ class TestWebSocketFrame(unittest.TestCase):
         self.assertIsInstance(stream_data, bytes)
         self.assertGreater(len(stream_data), 0)
 
+        # the pure Python fallback packs the header with precompiled formats
+        self.assertIsInstance(_pywsframecoder._HDR_16, Struct)
+        self.assertEqual(_pywsframecoder.build_frame(frame), stream_data)
+
     def test_from_streamdata(self):
         payload = b'Hello, WebSocket!'
         original_frame = Frame(payload=payload, opcode=OPCODES.TEXT, fin=1)
@@ -129,10 +335,33 @@ class TestWebSocketFrame(unittest.TestCase):
 
         parsed_frame = Frame.from_streamdata(stream_data)
 
+        self.assertIsInstance(parsed_frame, Frame)
         self.assertEqual(parsed_frame.payload, original_frame.payload)
         self.assertEqual(parsed_frame.opcode, original_frame.opcode)
         self.assertEqual(parsed_frame.fin, original_frame.fin)
 
+    def test_from_streamdata_no_copy(self):
+        payload = b'Hello, WebSocket!' * 10
+        mask_key = b'\x01\x02\x03\x04'
+        for coder in (_wsframecoder, _pywsframecoder):
+            with self.subTest(coder=coder.__name__):
+                stream_data = bytearray(Frame(payload=payload).to_streamdata())
+                parsed_frame = coder.parse_frame(Frame, stream_data, True, False)
+                self.assertIsInstance(parsed_frame.payload, memoryview)
+                self.assertEqual(parsed_frame.payload, payload)
+                self.assertEqual(parsed_frame.to_streamdata(), stream_data)
+                stream_data[-1:] = b'?'
+                self.assertEqual(parsed_frame.payload[-1:], b'?')
+
+                # a de-masked payload is always a copy, a masked one is a view
+                stream_data = Frame(payload=payload, mask=mask_key).to_streamdata()
+                parsed_frame = coder.parse_frame(Frame, stream_data, True, False)
+                self.assertIsInstance(parsed_frame.payload, bytes)
+                self.assertEqual(parsed_frame.payload, payload)
+                parsed_frame = coder.parse_frame(Frame, stream_data, False, False)
+                self.assertIsInstance(parsed_frame.payload, memoryview)
+                self.assertEqual(parsed_frame.payload, _wsframecoder.masking(payload, mask_key))
+
     def test_masking(self):
         payload = b'Hello, WebSocket!'
         mask_key = b'\x01\x02\x03\x04'
@@ -144,6 +373,70 @@ class TestWebSocketFrame(unittest.TestCase):
         demasked_payload = _wsframecoder.masking(masked_payload, mask_key)
         self.assertEqual(demasked_payload, payload)
 
+    def test_buffer_input(self):
+        payload = b'Hello, WebSocket!'
+        mask_key = b'\x01\x02\x03\x04'
+        stream_data = bytearray(Frame(payload=payload, mask=mask_key).to_streamdata())
+
+        parsed_frame = Frame.from_streamdata(memoryview(stream_data))
+        self.assertEqual(parsed_frame.payload, payload)
+
+        frame = Frame(payload=bytearray(payload), mask=mask_key)
+        masked_payload = frame.masked_payload()
+        frame.demask_inplace()
+        self.assertEqual(frame.payload, masked_payload)
+        frame.demask_inplace()
+        self.assertEqual(frame.payload, payload)
+
+    def test_python_fallback(self):
+        for amount in (0, 1, 7, 63, 64, 125, 126, 1000, 65535, 65536):
+            payload = bytes(range(256)) * (amount // 256) + bytes(range(amount % 256))
+            for mask in (None, b'\x01\x02\x03\x04'):
+                with self.subTest(amount=amount, mask=mask):
+                    frame = Frame(payload, OPCODES.BINARY, mask, 0, 1, 0, 1)
+                    stream_data = _wsframecoder.build_frame(frame)
+                    self.assertEqual(_pywsframecoder.build_frame(frame), stream_data)
+                    self.assertEqual(_pywsframecoder.build_many([frame, frame]), stream_data * 2)
+                    for auto_demask in (True, False):
+                        self.assertEqual(
+                            _pywsframecoder.parse(stream_data, auto_demask),
+                            _wsframecoder.parse(stream_data, auto_demask)
+                        )
+                        self.assertEqual(
+                            _pywsframecoder.parse_frame(Frame, memoryview(stream_data), auto_demask),
+                            _wsframecoder.parse_frame(Frame, stream_data, auto_demask)
+                        )
+                    header = _wsframecoder.read_header(stream_data[:2])
+                    self.assertEqual(_pywsframecoder.read_header(stream_data[:2]), header)
+                    continuation = (stream_data[2:2 + header[7]], header[6], header[5])
+                    self.assertEqual(
+                        _pywsframecoder.read_header_continuation(*continuation),
+                        _wsframecoder.read_header_continuation(*continuation)
+                    )
+                    if mask:
+                        self.assertEqual(_pywsframecoder.mask_frame(frame), _wsframecoder.mask_frame(frame))
+                        buffer = bytearray(payload)
+                        _pywsframecoder.masking_inplace(buffer, mask)
+                        self.assertEqual(buffer, _wsframecoder.masking(payload, mask))
+
+        key = b'dGhlIHNhbXBsZSBub25jZQ=='
+        self.assertEqual(_pywsframecoder.accept_key(key), _wsframecoder.accept_key(key))
+        header = HandshakeRequest(key, websocket_protocols=b'chat').to_streamdata()
+        self.assertEqual(_pywsframecoder.parse_headers(header), _wsframecoder.parse_headers(header))
+        continuation = (b'\xff' * 8, 127, False)
+        self.assertEqual(
+            _pywsframecoder.read_header_continuation(*continuation),
+            _wsframecoder.read_header_continuation(*continuation)
+        )
+        with self.assertRaises(ValueError):
+            _pywsframecoder.masking(b'', b'123')
+        with self.assertRaises(ValueError):
+            _pywsframecoder.parse(b'\x81', True)
+
+    def test_masking_kernel(self):
+        self.assertIn(_wsframecoder.MASKING_KERNEL, ("avx512bw", "avx2", "sse2", "neon", "swar64", "numba", "numpy", "bigint"))
+        self.assertIn(_pywsframecoder.MASKING_KERNEL, ("numba", "numpy", "bigint"))
+
     def test_rsv_bits_set(self):
         payload = b'Test message with RSV bits'
         frame = Frame(payload=payload, opcode=OPCODES.TEXT, fin=1, rsv1=1, rsv2=1, rsv3=1)
@@ -156,66 +449,7 @@ class TestWebSocketFrame(unittest.TestCase):
         self.assertEqual(parsed_frame.rsv3, 1)
 
     def test_constant_byte_parsing(self):
-        test_cases = [
-            # Small payload, no masking, TEXT frame, fin set, no RSV bits
-            {
-                "name": "small_unmasked_text",
-                "bytes": b'\x81\x0dHello, World!',
-                "expected": {
-                    "opcode": OPCODES.TEXT,
-                    "fin": 1,
-                    "rsv1": 0,
-                    "rsv2": 0,
-                    "rsv3": 0,
-                    "payload": b'Hello, World!',
-                    "masked": False
-                }
-            },
-            # Small payload, masked, BINARY frame, fin unset, RSV1 set
-            {
-                "name": "small_masked_binary_rsv1",
-                "bytes": b'\x42\x8c\x01\x02\x03\x04\x49\x67\x6f\x68\x6e\x2e\x23\x56\x52\x54\x32\x25',
-                "expected": {
-                    "opcode": OPCODES.BINARY,
-                    "fin": 0,
-                    "rsv1": 1,
-                    "rsv2": 0,
-                    "rsv3": 0,
-                    "payload": b'Hello, RSV1!',
-                    "masked": True
-                }
-            },
-            # Extended 16-bit length, unmasked, PING frame
-            {
-                "name": "extended_16_unmasked_ping",
-                "bytes": b'\x89\x7e\x00\x7e' + (pl := b'a' * 126),
-                "expected": {
-                    "opcode": OPCODES.PING,
-                    "fin": 1,
-                    "rsv1": 0,
-                    "rsv2": 0,
-                    "rsv3": 0,
-                    "payload": pl,
-                    "masked": False
-                }
-            },
-            # Extended 64-bit length, masked, PONG frame, all RSV bits set
-            {
-                "name": "extended_64_masked_pong_all_rsv",
-                "bytes": b'\xfA\xfe\x01\x10' + b'\x01\x02\x00\x04' + (b'\x00\x55\xff\x04' * (272 // 4)),
-                "expected": {
-                    "opcode": OPCODES.PONG,
-                    "fin": 1,
-                    "rsv1": 1,
-                    "rsv2": 1,
-                    "rsv3": 1,
-                    "payload": (b'\x01\x57\xff\x00' * (272 // 4)),
-                    "masked": True
-                }
-            }
-        ]
-
-        for case in test_cases:
+        for case in _CONSTANT_BYTE_CASES:
             with self.subTest(case=case["name"]):
                 # Parse the byte string into a Frame object
                 frame = Frame.from_streamdata(case["bytes"])
@@ -254,7 +488,7 @@ class TestWebSocketFrame(unittest.TestCase):
         stream_data_127 = frame_127.to_streamdata()
         parsed_frame_127 = Frame.from_streamdata(stream_data_127)
 
-        self.assertEqual(parsed_frame_127.payload, payload_127)
+        self._eq_bytes(parsed_frame_127.payload, payload_127)
         self.assertEqual(parsed_frame_127.amount_spec, 127)
         self.assertEqual(parsed_frame_127.amount, len(payload_127))
 
@@ -267,11 +501,36 @@ class TestWebSocketFrame(unittest.TestCase):
         stream_data = frame.to_streamdata()
         parsed_frame = Frame.from_streamdata(stream_data)
 
-        self.assertEqual(parsed_frame.payload, payload)
+        self._eq_bytes(parsed_frame.payload, payload)
         self.assertEqual(parsed_frame.amount_spec, 127)
         self.assertEqual(parsed_frame.amount, mb_amount)
 
 
+class TestFrameExceptions(unittest.TestCase):
+
+    def test_mask_too_short(self):
+        with self.assertRaisesRegex(ValueError, "invalid mask"):
+            Frame(payload=b'12', mask=b'123').to_streamdata()
+        with self.assertRaisesRegex(ValueError, "invalid mask"):
+            Frame(payload=b'12', mask=b'123').masked_payload()
+
+    def test_mask_too_long(self):
+        with self.assertRaisesRegex(ValueError, "invalid mask"):
+            Frame(payload=b'12', mask=b'12345').to_streamdata()
+        with self.assertRaisesRegex(ValueError, "invalid mask"):
+            Frame(payload=b'12', mask=b'12345').masked_payload()
+
+    def test_short_stream(self):
+        with self.assertRaisesRegex(ValueError, "invalid frame: data length < 2"):
+            Frame.from_streamdata(b'1')
+
+    def test_truncated_header(self):
+        with self.assertRaisesRegex(ValueError, r"invalid frame: data length \(2\) < header length \(4\)"):
+            Frame.from_streamdata(b'\x00\x7e')
+        with self.assertRaisesRegex(ValueError, r"invalid frame: data length \(2\) != expected data length \(3\)"):
+            Frame.from_streamdata(b'\x00\x01')
+
+
 if __name__ == '__main__':
     flags = str().join(argv[1:]).upper()
 
@@ -286,7 +545,6 @@ if __name__ == '__main__':
                 "   G   :(Gigabyte)         test 1GB payload",
                 "   P   :(Perf. and Mem)    test 2048 byte payload (2048 * 2048) times",
                 "   Q   :(Quick)            test set",
-                "   E   :(Exceptions)       test exceptions raised by the c implementation",
                 "   C   :(Communication)    test communication to a javascript WebSocket",
                 "-----------------",
                 "$ python test.py [flag(s)]\n"
@@ -298,25 +556,72 @@ if __name__ == '__main__':
         t = perf_counter_ns()
         print("[ Test 1GB payload ] start")
 
+        # encode and decode in pieces of about 4MB, compare the payloads by running hashes
         gb_amount = 10 ** 9
-        payload = b'g' * gb_amount
+        # the payload repeats this block, so the masked payload repeats the masked block
+        block = bytes(range(256)) * (4_000_000 // 256)
         mask_key = b'\x01\x02\x03\x04'
-
-        masked_frame = Frame(payload=payload, opcode=OPCODES.BINARY, fin=1, mask=mask_key)
-        masked_stream_data = masked_frame.to_streamdata()
-        parsed_masked_frame = Frame.from_streamdata(masked_stream_data)
-
-        assert parsed_masked_frame.payload == payload, "parsed_masked_frame.payload == payload"
-        assert parsed_masked_frame.amount_spec == 127, "parsed_masked_frame.amount_spec == 127"
-        assert parsed_masked_frame.amount == gb_amount, "parsed_masked_frame.amount == gb_amount"
-
-        frame = Frame(payload=payload, opcode=OPCODES.BINARY, fin=1)
-        stream_data = frame.to_streamdata()
-        parsed_frame = Frame.from_streamdata(stream_data)
-
-        assert parsed_frame.payload == payload, "parsed_frame.payload == payload"
-        assert parsed_frame.amount_spec == 127, "parsed_frame.amount_spec == 127"
-        assert parsed_frame.amount == gb_amount, "parsed_frame.amount == gb_amount"
+        # reference independent of the masking kernel: the XOR of the block and the tiled mask as integers
+        masked_block = (
+            int.from_bytes(block, "big") ^ int.from_bytes(mask_key * (len(block) // 4), "big")
+        ).to_bytes(len(block), "big")
+
+        hasher_in = blake2b()
+        hasher_in_masked = blake2b()
+        for _ in range(gb_amount // len(block)):
+            hasher_in.update(block)
+            hasher_in_masked.update(masked_block)
+
+        # one byte longer than the block, so each piece starts at another mask offset and ends within the mask
+        piece_amount = len(block) + 1
+        blocks = memoryview(block * 2)
+
+        def rotated(mask, offset):
+            # the mask continued at a payload offset
+            return mask[offset % 4:] + mask[:offset % 4]
+
+        def stream(mask):
+            # the header of the whole frame from the encoder,
+            # with a zero filled payload whose pages are only mapped on demand
+            streamdata = Frame(bytes(gb_amount), OPCODES.BINARY, mask).to_streamdata()
+            header = streamdata[:len(streamdata) - gb_amount]
+            del streamdata
+            yield header
+
+            # then the payload piece by piece, each masked at its offset
+            offset = 0
+            while offset < gb_amount:
+                start = offset % len(block)
+                piece = blocks[start:start + min(piece_amount, gb_amount - offset)]
+                yield _wsframecoder.masking(piece, rotated(mask, offset)) if mask else piece
+                offset += len(piece)
+
+        for mask in (mask_key, None):
+            streamdata = stream(mask)
+            header = next(streamdata)
+
+            sr = StreamReader(payloads_masked=bool(mask))
+            header_continuation = sr.progressive_read(header[:2])
+            amount = sr.progressive_read(header[2:2 + header_continuation])
+
+            assert len(header) == 2 + header_continuation, "len(header) == 2 + header_continuation"
+            assert amount == gb_amount, "amount == gb_amount"
+            assert sr.amount_spec == 127, "sr.amount_spec == 127"
+            assert sr.mask == mask, "sr.mask == mask"
+
+            hasher_stream = blake2b()
+            hasher_out = blake2b()
+            received = 0
+            for data in streamdata:
+                hasher_stream.update(data)
+                if sr.mask:
+                    data = _wsframecoder.masking(data, rotated(sr.mask, received))
+                hasher_out.update(data)
+                received += len(data)
+
+            assert received == amount, "received == amount"
+            assert hasher_stream.digest() == (hasher_in_masked if mask else hasher_in).digest(), "hasher_stream.digest() == reference digest"
+            assert hasher_out.digest() == hasher_in.digest(), "hasher_out.digest() == hasher_in.digest()"
 
         print(f"[ Test 1GB payload ] done in {((perf_counter_ns() - t) / 1e+9):.3f}s", )
 
@@ -326,8 +631,15 @@ if __name__ == '__main__':
 
         payload = b'p' * 2048
         mask_key = b'\x01\x02\x03\x04'
+        frame = Frame(payload=payload, opcode=OPCODES.BINARY, fin=1, mask=mask_key)
+        buffer = bytearray(2 + 8 + 4 + len(payload))
+        view = memoryview(buffer)
+        # bound once, the loop body only looks up plain names
+        write_streamdata = frame.write_streamdata
+        from_streamdata = Frame.from_streamdata
         for i in range(2048 * 2048):
-            Frame.from_streamdata(Frame(payload=payload, opcode=OPCODES.BINARY, fin=1, mask=mask_key).to_streamdata())
+            n = write_streamdata(buffer)
+            from_streamdata(view[:n])
 
         print(f"[ Test 2048 byte payload (2048 * 2048) times ] done in {((perf_counter_ns() - t) / 1e+9):.3f}s", )
 
@@ -368,119 +680,88 @@ if __name__ == '__main__':
 
         print(f"[ Quick Test ] done in {((perf_counter_ns() - t) / 1e+9):.3f}s", )
 
-    if "E" in flags:
-        t = perf_counter_ns()
-        print("[ Test Exceptions ] start")
-
-        try:
-            Frame(payload=b'12', mask=b'123').to_streamdata()
-        except ValueError as e:
-            print(e)
-        else:
-            assert False
-        try:
-            Frame(payload=b'12', mask=b'123').masked_payload()
-        except ValueError as e:
-            print(e)
-        else:
-            assert False
-        try:
-            Frame(payload=b'12', mask=b'12345').to_streamdata()
-        except ValueError as e:
-            print(e)
-        else:
-            assert False
-        try:
-            Frame(payload=b'12', mask=b'12345').masked_payload()
-        except ValueError as e:
-            print(e)
-        else:
-            assert False
-        try:
-            Frame.from_streamdata(b'1')
-        except ValueError as e:
-            print(e)
-        else:
-            assert False
-        try:
-            Frame.from_streamdata(b'\x00\x01')
-        except ValueError as e:
-            print(e)
-        else:
-            assert False
-
-        print(f"[ Test Exceptions ] done in {((perf_counter_ns() - t) / 1e+9):.3f}s", )
-
     if "C" in flags:
 
-        def s():
+        async def read_frame(reader, sr):
+            val = 2
+            while isinstance(val, int):
+                val = sr.progressive_read(await reader.readexactly(val))
+            return val
+
+        async def communicate(reader, writer):
+            print("# New connection from <%s:%d>" % writer.get_extra_info("peername")[:2])
+
+            request = await reader.readuntil(b"\r\n\r\n")
+            header = HandshakeRequest.from_streamdata(request)
+            print("# Header received:")
+            for ln in pprint.pformat(header).splitlines():
+                print("<", ln)
+
+            print("# Send response:")
+            response = header.make_response()
+            for ln in pprint.pformat(response).splitlines():
+                print(">", ln)
+            writer.write(response.to_streamdata())
+
+            sr = StreamReader(payloads_masked=True)
+
+            for _ in range(2):
+                val = await read_frame(reader, sr)
+                print("# Message received:")
+                print("<", val)
+
+            print("# Send message:")
+            msg = Frame(b"Hello World!", mask=b"")
+            print(">", msg)
+            writer.write(msg.to_streamdata())
+
+            print("# Send ping:")
+            msg = Frame(b"", OPCODES.PING)
+            print(">", msg)
+            writer.write(msg.to_streamdata())
+
+            print("# Pong received:")
+            print("<", await read_frame(reader, sr))
+
+            print("# Send first part of a fragmented message:")
+            msg = Frame(b"Foo", mask=b"1234", fin=0)
+            print(">", msg)
+            writer.write(msg.to_streamdata())
+            print("# Send final part of a fragmented message:")
+            msg = Frame(b"Bar", OPCODES.CONTINUE, mask=b"", fin=1)
+            print(">", msg)
+            writer.write(msg.to_streamdata())
+
+            print("# Send close:")
+            msg = Frame(CLOSECODES.NORMAL_CLOSURE.to_payload(b"Goodbye!"), OPCODES.CLOSE)
+            print(">", msg)
+            writer.write(msg.to_streamdata())
+
+            print("# Close received:")
+            print("<", await read_frame(reader, sr))
+
+            writer.close()
+            await writer.wait_closed()
+
+        async def serve():
             print("[ Test Communication ] start")
 
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-                sock.bind(("localhost", 7890))
-                print("# Socket bound to <localhost:7890>")
-
-                sock.listen(1)
-                con, addr = sock.accept()
-                print("# New connection from <%s:%d>" % addr)
+            done = asyncio.get_running_loop().create_future()
 
-                request = con.recv(1024)
-                header = HandshakeRequest.from_streamdata(request)
-                print("# Header received:")
-                for ln in pprint.pformat(header).splitlines():
-                    print("<", ln)
-
-                print("# Send response:")
-                response = header.make_response()
-                for ln in pprint.pformat(response).splitlines():
-                    print(">", ln)
-                con.send(response.to_streamdata())
-
-                sr = StreamReader(payloads_masked=True)
-
-                for _ in range(2):
-                    val = 2
-                    while isinstance(val, int):
-                        val = sr.progressive_read(con.recv(val))
-
-                    print("# Message received:")
-                    print("<", val)
-
-                print("# Send message:")
-                msg = Frame(b"Hello World!", mask=b"")
-                print(">", msg)
-                con.send(msg.to_streamdata())
-
-                print("# Send ping:")
-                msg = Frame(b"", OPCODES.PING)
-                print(">", msg)
-                con.send(msg.to_streamdata())
-
-                msg = con.recv(1024)
-                print("# Pong received:")
-                print("<", Frame.from_streamdata(msg))
-
-                print("# Send first part of a fragmented message:")
-                msg = Frame(b"Foo", mask=b"1234", fin=0)
-                print(">", msg)
-                con.send(msg.to_streamdata())
-                print("# Send final part of a fragmented message:")
-                msg = Frame(b"Bar", OPCODES.CONTINUE, mask=b"", fin=1)
-                print(">", msg)
-                con.send(msg.to_streamdata())
-
-                print("# Send close:")
-                msg = Frame(CLOSECODES.NORMAL_CLOSURE.to_payload(b"Goodbye!"), OPCODES.CLOSE)
-                print(">", msg)
-                con.send(msg.to_streamdata())
-
-                input("\nPress Any Key")
-
-                print("[ Test Communication ] done")
+            async def handle(reader, writer):
+                try:
+                    await communicate(reader, writer)
+                finally:
+                    if not done.done():
+                        done.set_result(None)
 
+            server = await asyncio.start_server(handle, "localhost", 7890, reuse_address=True)
+            async with server:
+                print("# Socket bound to <localhost:7890>")
+                # the page connects immediately, so open it only once the server is listening
+                webbrowser.open(f"file://{Path(__file__).parent.__str__()}/test.html")
+                await done
 
-        threading.Thread(target=s).start()
+            print("[ Test Communication ] done")
 
-        webbrowser.open(f"file://{Path(__file__).parent.__str__()}/test.html")
+        asyncio.run(serve())